@@ -30,11 +30,22 @@ setup(
 
     # Runtime dependencies
     install_requires=[
+        "numpy",
         "pyvisa",
         'pyvisa-py; sys_platform=="linux"',
         'pyusb; sys_platform=="linux"',
     ],
 
+    # Optional dependencies
+    extras_require={
+        "yaml": ["pyyaml"],
+    },
+
+    # Command line entry points
+    entry_points={
+        "console_scripts": ["tektronixsg=tektronixsg.cli:main"],
+    },
+
     # Python version requirement
     python_requires='>=3',
 
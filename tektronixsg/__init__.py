@@ -1,2 +1,9 @@
 """Top-level package for Tektronix Signal Generator Interface."""
 from .generator import SignalGenerator, list_connected_devices, list_connected_tektronix_generators
+from .limiter import RateLimiter
+from .pipeline import CommandPipeline
+from .group import ChannelGroup
+from .waveforms import WaveformBuilder, encode_waveform
+from .transport import SocketTransport, UsbtmcTransport, VisaTransport
+from .sequence import Sequence
+from .timeline import Timeline
@@ -1,5 +1,8 @@
 import time
 
+from .waveforms import MAX_WAVEFORM_LENGTH, encode_stream, \
+    encode_waveform, open_waveform_file, reduce_waveform
+
 SIGNAL_TYPES_AFG1022 = {"sine": "SIN", "square": "SQU", "pulse": "PULS",
                         "ramp": "RAMP", "noise": "PRN", "dc": "DC",
                         "memory1": "EMEM"}
@@ -15,6 +18,24 @@ BURST_MODE = {"triggered": "TRIG", "gated": "GAT"}
 
 PULSE_HOLD = {"width": "WIDT", "duty": "DUTY"}
 
+# Waveform files in the internal memory used for double buffering,
+# formatted with the channel number and the buffer index
+BUFFER_FILES = "M:/tektronixsg_ch{}_{}.tfwx"
+
+MODULATION_TYPES = {"am": "AM", "fm": "FM", "pm": "PM", "fsk": "FSK",
+                    "pwm": "PWM"}
+
+MODULATION_SOURCE = {"internal": "INT", "external": "EXT"}
+
+MODULATION_SHAPES_AFG1022 = {"sine": "SIN", "square": "SQU", "ramp": "RAMP",
+                             "negative ramp": "NRAM", "triangle": "TRI",
+                             "noise": "PRN"}
+
+MODULATION_SHAPES_AFG31000 = {"sine": "SIN", "square": "SQU",
+                              "ramp": "RAMP", "negative ramp": "NRAM",
+                              "triangle": "TRI", "noise": "PRN",
+                              "memory1": "EMEM", "memory2": "EMEM2"}
+
 
 class Channel:
     """Class that represents the channel of the signal generator.
@@ -41,6 +62,20 @@ class Channel:
         """
         self.generator = generator
         self.channel_number = channel_number
+        self._active_buffer = None
+
+    def get(self, *names):
+        """Read several properties with one compound query.
+
+        Args:
+            *names (str): Names of the properties.
+
+        Returns:
+            dict: The values with the names as keys.
+        """
+        values = self.generator.get_many(
+            *[(self.channel_number, name) for name in names])
+        return {name: values[(self.channel_number, name)] for name in names}
 
     @property
     def output_on(self):
@@ -134,6 +169,7 @@ class Channel:
             signal_types = SIGNAL_TYPES_AFG31000
         self.generator.write(
             "SOUR{}:FUNC {}".format(self.channel_number, signal_types[value]))
+        self._active_buffer = None
 
     @property
     def impedance(self):
@@ -401,29 +437,228 @@ class Channel:
         self.generator.write(
             "SOUR{}:PULS:TRAN:TRA {}".format(self.channel_number, value))
 
-    def set_arbitrary_signal(self, voltage_vector):
+    @property
+    def modulation(self):
+        """Get the enabled modulation or disable the modulation by setting
+        None.
+
+        Possible options are stated in MODULATION_TYPES, use
+        :meth:`set_modulation` to enable a modulation.
+        """
+        # All states are queried, so get_many records every query
+        states = [self.generator.query_bool(
+            "SOUR{}:{}:STAT?".format(self.channel_number, value))
+            for value in MODULATION_TYPES.values()]
+        for name, state in zip(MODULATION_TYPES, states):
+            if state:
+                return name
+        return None
+
+    @modulation.setter
+    def modulation(self, value):
+        if value is not None:
+            raise ValueError("Use set_modulation to enable a modulation")
+        self.generator.write_many(
+            ["SOUR{}:{}:STAT 0".format(self.channel_number, item)
+             for item in MODULATION_TYPES.values()])
+
+    def set_modulation(self, modulation, source="internal", depth=None,
+                       deviation=None, frequency=None, shape=None,
+                       hop_frequency=None):
+        """Configure and enable a modulation of the signal.
+
+        The modulation is generated by the instrument, all settings are
+        written in one batch. Settings which are not specified keep their
+        current value.
+
+        Args:
+            modulation (str): Type of the modulation, see MODULATION_TYPES.
+            source (str): Source of the modulating signal, see
+                          MODULATION_SOURCE.
+            depth (float): Modulation depth of "am" in percent.
+            deviation (float): Peak deviation of "fm" in Hz, of "pm" in
+                               radiant and of "pwm" in percent of the
+                               period.
+            frequency (float): Frequency of the internal modulating signal
+                               in Hz. Rate of the frequency hops for "fsk".
+            shape (str): Shape of the internal modulating signal, see
+                         MODULATION_SHAPES for the different devices. Not
+                         used by "fsk".
+            hop_frequency (float): Frequency hopped to by "fsk" in Hz.
+        """
+        if self.generator.connected_device == "AFG1022":
+            shapes = MODULATION_SHAPES_AFG1022
+        elif self.generator.connected_device == "AFG31052":
+            shapes = MODULATION_SHAPES_AFG31000
+        if modulation not in MODULATION_TYPES:
+            raise ValueError("Unknown modulation {}".format(modulation))
+        if depth is not None and modulation != "am":
+            raise ValueError("Depth is only used by am")
+        if deviation is not None and modulation not in ("fm", "pm", "pwm"):
+            raise ValueError("Deviation is only used by fm, pm and pwm")
+        if hop_frequency is not None and modulation != "fsk":
+            raise ValueError("Hop frequency is only used by fsk")
+        if shape is not None and modulation == "fsk":
+            raise ValueError("Shape is not used by fsk")
+        if shape is not None and shape not in shapes:
+            raise ValueError("Shape {} is not supported by the {}".format(
+                shape, self.generator.connected_device))
+        prefix = "SOUR{}:{}".format(self.channel_number,
+                                    MODULATION_TYPES[modulation])
+        commands = ["{}:SOUR {}".format(prefix, MODULATION_SOURCE[source])]
+        if depth is not None:
+            commands.append("{}:DEPT {}".format(prefix, depth))
+        if deviation is not None:
+            if modulation == "pwm":
+                commands.append("{}:DEV:DCYC {}".format(prefix, deviation))
+            else:
+                commands.append("{}:DEV {}".format(prefix, deviation))
+        if hop_frequency is not None:
+            commands.append("{}:FREQ {}".format(prefix, hop_frequency))
+        if frequency is not None:
+            if modulation == "fsk":
+                commands.append("{}:INT:RATE {}".format(prefix, frequency))
+            else:
+                commands.append("{}:INT:FREQ {}".format(prefix, frequency))
+        if shape is not None:
+            commands.append("{}:INT:FUNC {}".format(prefix, shapes[shape]))
+        commands.append("{}:STAT 1".format(prefix))
+        self.generator.write_many(commands)
+
+    def set_arbitrary_signal(self, voltage_vector, optimize=False,
+                             tolerance=1e-3):
         """Convenience method to instantly set an arbitrary signal with an
         one dimensional vector for the voltage.
 
         Args:
             voltage_vector (numpy.ndarray): Voltage vector as numpy array.
+            optimize (bool): Upload only the fundamental period of periodic
+                             signals, decimated if it consists of constant
+                             blocks, see :func:`.reduce_waveform`. The
+                             frequency is scaled so the output is unchanged,
+                             thus has to be set before.
+            tolerance (float): Maximum deviation of the optimized signal
+                               relative to its peak-to-peak voltage.
+
+        Returns:
+            dict: If optimized, the 'reduction' factor of the length, the
+            'repetitions' of the uploaded period, the 'decimation' of
+            constant blocks and the maximum reconstruction 'error' in Volt.
+        """
+        if not optimize:
+            self.set_encoded_signal(encode_waveform(voltage_vector))
+            return None
+        reduced, repetitions, decimation, error = reduce_waveform(
+            voltage_vector, tolerance)
+        self.set_encoded_signal(encode_waveform(reduced))
+        if repetitions > 1:
+            self.frequency = self.frequency * repetitions
+        return {"reduction": len(voltage_vector) / len(reduced),
+                "repetitions": repetitions, "decimation": decimation,
+                "error": error}
+
+    def set_encoded_signal(self, waveform):
+        """Set an arbitrary signal which is already encoded.
+
+        Args:
+            waveform (EncodedWaveform): Waveform as returned by
+                                        :func:`.encode_waveform` or a
+                                        :class:`.WaveformBuilder`.
         """
         # Memory number corresponds to channel number,
         # selecting memory 1 on channel 2 is not possible
         memory = self.channel_number
-        if len(voltage_vector) > 8192:
-            raise ValueError("Maximum waveform length is 8192")
-        if len(voltage_vector) < 2:
+        self._check_waveform_length(len(waveform.data))
+        self.generator.write_data_emom(waveform.data, memory)
+        self._select_memory(memory, waveform.voltage_amplitude,
+                            waveform.voltage_offset)
+
+    def swap_arbitrary_signal(self, voltage_vector):
+        """Switch to another arbitrary signal without interrupting the
+        output.
+
+        Two waveform files in the internal memory are used as buffers. The
+        new signal is uploaded into the buffer which is not playing while
+        the current signal keeps running, then both are swapped with a
+        single function select. The edit memory is only used to stage the
+        uploads, so the first call interrupts the output, if the edit
+        memory is playing.
+
+        Not supported by the AFG1022.
+
+        Args:
+            voltage_vector (numpy.ndarray): Voltage vector as numpy array.
+
+        Returns:
+            float: Time in seconds from sending the switch until the
+            instrument reports it complete, including the pacing of the
+            write.
+        """
+        if self.generator.connected_device == "AFG1022":
+            raise NotImplementedError
+        memory = self.channel_number
+        waveform = encode_waveform(voltage_vector)
+        self._check_waveform_length(len(waveform.data))
+        buffer = 1 if self._active_buffer == 0 else 0
+        path = BUFFER_FILES.format(self.channel_number, buffer)
+        self.generator.write_data_emom(waveform.data, memory)
+        self.generator.write('MMEM:STOR:TRAC EMEM{},"{}"'.format(memory,
+                                                                 path))
+        self.generator.wait_for_completion()
+        # The function is selected every time, as it may have been changed
+        # by commands which do not pass this channel
+        prefix = "SOUR{}".format(self.channel_number)
+        commands = ['{}:FUNC:EFIL "{}"'.format(prefix, path),
+                    "{}:FUNC EFIL".format(prefix),
+                    "{}:VOLT {}".format(prefix, waveform.voltage_amplitude),
+                    "{}:VOLT:OFFS {}".format(prefix, waveform.voltage_offset)]
+        start = time.perf_counter()
+        self.generator.write_many(commands)
+        self.generator.wait_for_completion()
+        latency = time.perf_counter() - start
+        self._active_buffer = buffer
+        return latency
+
+    def set_arbitrary_file(self, path, sample_format=None, scale=None,
+                           file_channel=0, chunk_size=65536):
+        """Set an arbitrary signal stored in a file.
+
+        The file is memory-mapped and encoded and uploaded in chunks, so
+        the memory usage does not depend on the file size. See
+        :func:`.open_waveform_file` for the supported formats.
+
+        Args:
+            path (str): Path of the file.
+            sample_format (str): NumPy data type of the samples of raw
+                                 files. Defaults to little endian int16.
+            scale (float): Voltage per sample unit. If not specified,
+                           integer WAV samples are scaled to a full scale of
+                           1 V and all other samples are taken as Volt.
+            file_channel (int): Channel of multi channel WAV files or column
+                                of two dimensional .npy files.
+            chunk_size (int): Number of samples encoded at a time.
+        """
+        memory = self.channel_number
+        samples, file_scale, zero = open_waveform_file(path, sample_format,
+                                                       file_channel)
+        self._check_waveform_length(len(samples))
+        if scale is None:
+            scale = file_scale
+        voltage_amplitude, voltage_offset, chunks = encode_stream(
+            samples, scale, zero, chunk_size)
+        self.generator.write_data_emom_stream(chunks, len(samples), memory)
+        self._select_memory(memory, voltage_amplitude, voltage_offset)
+
+    def _check_waveform_length(self, length):
+        max_length = MAX_WAVEFORM_LENGTH[self.generator.connected_device]
+        if length > max_length:
+            raise ValueError("Maximum waveform length is {}".format(
+                max_length))
+        if length < 2:
             raise ValueError("Minimum waveform length is 2")
-        min_voltage = min(voltage_vector)
-        max_voltage = max(voltage_vector)
-        voltage_range = abs(max_voltage-min_voltage)
-        voltage_offset = (min_voltage+max_voltage)/2
-        normed_voltage = abs(voltage_vector-min_voltage)/voltage_range
-        tmp = 16383*normed_voltage
-        voltage_bits = tmp.astype(int)
-        self.generator.write_data_emom(voltage_bits, memory)
+
+    def _select_memory(self, memory, voltage_amplitude, voltage_offset):
         time.sleep(0.2)
         self.signal_type = "memory{}".format(memory)
-        self.voltage_amplitude = voltage_range
+        self.voltage_amplitude = voltage_amplitude
         self.voltage_offset = voltage_offset
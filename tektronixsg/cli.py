@@ -0,0 +1,305 @@
+"""Command line interface of tektronixsg."""
+import argparse
+import inspect
+import json
+import os
+import sys
+import time
+
+from .channel import Channel
+from .commands import CommandRecorder, join_commands
+from .generator import SignalGenerator, list_connected_tektronix_generators
+from .server import InstrumentServer
+
+# Keys of a device configuration which are not generator properties
+DEVICE_KEYS = ("serial", "model", "channels")
+
+# Models a configuration can be written for
+MODELS = ("AFG1022", "AFG31052")
+
+
+def parse_address(address):
+    """Convert a command line address to a listener address.
+
+    Args:
+        address (str): "HOST:PORT" or ":PORT" for TCP, a path for a Unix
+                       socket. The host defaults to 127.0.0.1.
+    """
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def serve(arguments):
+    """Run an instrument server until interrupted."""
+    authkey = arguments.authkey.encode() if arguments.authkey else None
+    address = parse_address(arguments.address)
+    if isinstance(address, tuple) and authkey is None:
+        arguments.parser.error("--authkey is required for TCP addresses")
+    server = InstrumentServer(address, authkey)
+    print("Serving on {}".format(server.address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def load_configuration(path):
+    """Read a configuration file.
+
+    Files ending in .yaml or .yml are read with PyYAML, all others as JSON.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        list: Configurations of the devices. A file containing a single
+        device instead of a "devices" list yields one configuration.
+
+    Raises:
+        ValueError: If the file does not contain a mapping.
+    """
+    with open(path) as configuration_file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML files")
+            configuration = yaml.safe_load(configuration_file)
+        else:
+            configuration = json.load(configuration_file)
+    if not isinstance(configuration, dict):
+        raise ValueError("The configuration must be a mapping")
+    if "devices" in configuration:
+        return configuration["devices"]
+    return [configuration]
+
+
+def device_commands(model, device):
+    """Format the settings of a device configuration as commands.
+
+    Generator properties are given as keys of the device configuration,
+    channel properties in a "channels" mapping of channel numbers to
+    settings. The "waveform" key of a channel is not included, as
+    waveform files are uploaded separately.
+
+    Args:
+        model (str): Model the commands are formatted for.
+        device (dict): Configuration of the device.
+
+    Returns:
+        list: The commands in the order of the configuration.
+    """
+    recorder = CommandRecorder(model)
+    for name, value in device.items():
+        if name in DEVICE_KEYS:
+            continue
+        if not isinstance(getattr(SignalGenerator, name, None), property):
+            raise ValueError("Unknown generator property {}".format(name))
+        getattr(SignalGenerator, name).fset(recorder, value)
+    for channel_number, settings in device.get("channels", {}).items():
+        if str(channel_number) not in ("1", "2"):
+            raise ValueError("Unknown channel {}".format(channel_number))
+        channel = recorder.channels[int(channel_number) - 1]
+        for name, value in settings.items():
+            if name == "waveform":
+                continue
+            if not isinstance(getattr(Channel, name, None), property):
+                raise ValueError("Unknown channel property {}".format(name))
+            setattr(channel, name, value)
+    return recorder.commands
+
+
+def waveform_files(device):
+    """Get the waveform files of a device configuration.
+
+    The "waveform" key of a channel is either the path of the file or a
+    mapping of the arguments of :meth:`.Channel.set_arbitrary_file`.
+
+    Returns:
+        list: Tuples of the channel number and the keyword arguments.
+    """
+    files = []
+    for channel_number, settings in device.get("channels", {}).items():
+        waveform = settings.get("waveform")
+        if waveform is None:
+            continue
+        if isinstance(waveform, str):
+            waveform = {"path": waveform}
+        files.append((str(channel_number), waveform))
+    return files
+
+
+def validate_device(device):
+    """Check a device configuration without connecting to an instrument.
+
+    The settings are formatted for the configured model. Configurations
+    without a model have to be valid for at least one model in MODELS.
+
+    Args:
+        device (dict): Configuration of the device.
+
+    Raises:
+        ValueError: If the configuration or its waveform files are invalid.
+    """
+    if not isinstance(device, dict) or \
+            not isinstance(device.get("channels", {}), dict):
+        raise ValueError("A device and its channels must be mappings")
+    models = [device["model"]] if "model" in device else MODELS
+    for model in models:
+        if model not in MODELS:
+            raise ValueError("Unknown model {}".format(model))
+    errors = []
+    for model in models:
+        try:
+            device_commands(model, device)
+        except (ValueError, KeyError, TypeError,
+                NotImplementedError) as error:
+            errors.append("{} ({}: {})".format(model, type(error).__name__,
+                                               error))
+    if len(errors) == len(models):
+        raise ValueError("Invalid settings, {}".format("; ".join(errors)))
+    parameters = inspect.signature(Channel.set_arbitrary_file)
+    for channel_number, arguments in waveform_files(device):
+        if not isinstance(arguments, dict):
+            raise ValueError("Invalid waveform of channel {}".format(
+                channel_number))
+        try:
+            parameters.bind(None, **arguments)
+        except TypeError as error:
+            raise ValueError("Invalid waveform of channel {}: {}".format(
+                channel_number, error))
+        if not os.path.isfile(arguments["path"]):
+            raise ValueError("Waveform file {} not found".format(
+                arguments["path"]))
+
+
+def select_devices(devices):
+    """Pair the device configurations with serial numbers.
+
+    Configurations without a serial number are applied to every connected
+    generator which is not selected by another configuration.
+
+    Returns:
+        list: Tuples of the serial number and the configuration.
+    """
+    selected = [(device["serial"], device) for device in devices
+                if "serial" in device]
+    unselected = [device for device in devices if "serial" not in device]
+    if unselected:
+        serials = {serial for serial, _ in selected}
+        for info in list_connected_tektronix_generators():
+            serial = info["Serial Number"]
+            if serial in serials:
+                continue
+            for device in unselected:
+                if device.get("model", info["Model"]) == info["Model"]:
+                    selected.append((serial, device))
+    return selected
+
+
+def apply_device(serial, device):
+    """Configure one generator in one batched transaction.
+
+    Errors the instrument reports while it is configured are collected,
+    errors pending when the connection is opened are issued as warnings.
+
+    Returns:
+        tuple: The number of commands and the list of errors.
+    """
+    generator = SignalGenerator(serial)
+    try:
+        # The first generator found is opened if the serial is unknown
+        if generator.serial_number != serial:
+            raise RuntimeError("Could not find the generator {}".format(
+                serial))
+        model = device.get("model", generator.connected_device)
+        if model != generator.connected_device:
+            raise ValueError("Expected a {}, found a {}".format(
+                model, generator.connected_device))
+        commands = device_commands(model, device)
+        with generator.collect_errors() as errors:
+            for channel_number, arguments in waveform_files(device):
+                generator.channels[int(channel_number) - 1]\
+                    .set_arbitrary_file(**arguments)
+            generator.write_many(commands)
+    finally:
+        generator.close()
+    return len(commands), errors
+
+
+def dry_run(devices):
+    """Print the commands of the device configurations."""
+    for device in devices:
+        if "model" not in device:
+            raise ValueError("A dry run requires the model of every device")
+        commands = device_commands(device["model"], device)
+        print("# {} {}".format(device["model"],
+                               device.get("serial", "(discovered)")))
+        for channel_number, waveform in waveform_files(device):
+            print("# upload {} to channel {}".format(
+                waveform["path"], channel_number))
+        for message in join_commands(commands):
+            print(message)
+
+
+def apply(arguments):
+    """Apply a configuration file to the generators."""
+    try:
+        devices = load_configuration(arguments.configuration)
+        # Check everything before connecting to any instrument
+        for device in devices:
+            validate_device(device)
+        if arguments.dry_run:
+            dry_run(devices)
+            return 0
+    except (OSError, ImportError, ValueError, KeyError, TypeError) as error:
+        # Exits with status 2 like other usage errors
+        arguments.parser.error(str(error))
+    failed = 0
+    for serial, device in select_devices(devices):
+        start = time.perf_counter()
+        try:
+            count, errors = apply_device(serial, device)
+        except Exception as error:
+            count, errors = 0, ["{}: {}".format(type(error).__name__,
+                                                error)]
+        print("{}: {} commands in {:.3f} s, {} errors".format(
+            serial, count, time.perf_counter() - start, len(errors)))
+        for error in errors:
+            print("    {}".format(error))
+        failed += bool(errors)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    """Entry point of the tektronixsg command."""
+    parser = argparse.ArgumentParser(
+        prog="tektronixsg",
+        description="Interface for Tektronix signal generators.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="share the connected generators with other processes")
+    serve_parser.add_argument(
+        "address", help="path of a Unix socket or [HOST]:PORT for TCP, "
+                        "the host defaults to 127.0.0.1")
+    serve_parser.add_argument(
+        "--authkey", help="key clients have to authenticate with, "
+                          "required for TCP")
+    serve_parser.set_defaults(function=serve, parser=serve_parser)
+
+    apply_parser = subparsers.add_parser(
+        "apply", help="configure generators from a YAML or JSON file")
+    apply_parser.add_argument(
+        "configuration", help="path of the configuration file")
+    apply_parser.add_argument(
+        "--dry-run", action="store_true",
+        help="print the commands instead of sending them")
+    apply_parser.set_defaults(function=apply, parser=apply_parser)
+
+    arguments = parser.parse_args(argv)
+    sys.exit(arguments.function(arguments))
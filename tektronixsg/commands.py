@@ -0,0 +1,143 @@
+"""Helpers to build command strings without sending them."""
+import functools
+
+from .channel import Channel
+
+# Maximum length of a compound message sent in one transfer
+MAX_MESSAGE_LENGTH = 1024
+
+
+class CommandRecorder:
+    """Stand-in for :class:`.SignalGenerator` that collects the commands
+    written by property setters instead of sending them.
+
+    Attributes:
+        connected_device (str): Model the commands are formatted for.
+        channels (list): Channels writing to the recorder.
+        commands (list): Recorded commands in order.
+    """
+    def __init__(self, connected_device):
+        """Initialize the recorder.
+
+        Args:
+            connected_device (str): Model the commands are formatted for.
+        """
+        self.connected_device = connected_device
+        self.channels = [Channel(self, "1"), Channel(self, "2")]
+        self.commands = []
+
+    def write(self, write_string):
+        """Record a command."""
+        self.commands.append(write_string)
+
+    def query(self, query_string):
+        """Queries cannot be recorded."""
+        raise RuntimeError("Cannot query while recording commands")
+
+
+class QueryProxy:
+    """Stand-in for :class:`.SignalGenerator` answering the queries of
+    property getters with a given function.
+
+    Used to record the queries of getters and to evaluate the getters with
+    responses read before. Getters have to query the proxy only through
+    the query methods, and their queries may only depend on the responses
+    to earlier queries of the same getter.
+
+    Attributes:
+        connected_device (str): Model the queries are formatted for.
+        channels (list): Channels querying the proxy.
+    """
+    def __init__(self, generator, query):
+        """Initialize the proxy.
+
+        Args:
+            generator: The :class:`.SignalGenerator` whose getters and
+                       conversions are used.
+            query (callable): Function called with the query string and
+                              returning the response.
+        """
+        self.connected_device = generator.connected_device
+        self.channels = [Channel(self, "1"), Channel(self, "2")]
+        self.query = query
+        self._generator_class = type(generator)
+        for name in ("query_int", "query_float", "query_str", "query_bool"):
+            setattr(self, name, functools.partial(
+                getattr(self._generator_class, name), self))
+
+    def read(self, name, channel_number=None):
+        """Evaluate a property getter.
+
+        Args:
+            name (str): Name of the property.
+            channel_number (str): Number of the channel owning the property.
+                                  If not specified, the property of the
+                                  generator is read.
+        """
+        if channel_number is None:
+            return getattr(self._generator_class, name).fget(self)
+        return getattr(self.channels[int(channel_number) - 1], name)
+
+
+def record_setting(generator, name, value, channel_number=None):
+    """Get the commands a property setter would write.
+
+    Args:
+        generator: The :class:`.SignalGenerator` the commands are meant for.
+        name (str): Name of the property.
+        value: Value to set.
+        channel_number (str): Number of the channel owning the property. If
+                              not specified, the property of the generator
+                              is used.
+
+    Returns:
+        list: The commands written by the setter.
+    """
+    recorder = CommandRecorder(generator.connected_device)
+    if channel_number is None:
+        getattr(type(generator), name).fset(recorder, value)
+    else:
+        setattr(recorder.channels[int(channel_number) - 1], name, value)
+    return recorder.commands
+
+
+def join_commands(commands):
+    """Combine commands to compound messages.
+
+    Every command except common commands is prefixed with a colon so it is
+    interpreted from the root of the command tree.
+
+    Args:
+        commands (list): Commands to combine.
+
+    Returns:
+        list: Messages no longer than MAX_MESSAGE_LENGTH, unless a single
+        command already exceeds it.
+    """
+    return [";".join(group) for group in group_commands(commands)]
+
+
+def group_commands(commands):
+    """Split commands into the groups sent as one compound message each.
+
+    Args:
+        commands (list): Commands to combine.
+
+    Returns:
+        list: Lists of the prefixed commands of each message, see
+        :func:`join_commands`.
+    """
+    groups = []
+    group = []
+    length = 0
+    for command in commands:
+        if not command.startswith(("*", ":")):
+            command = ":" + command
+        if group and length + len(command) + 1 > MAX_MESSAGE_LENGTH:
+            groups.append(group)
+            group = []
+        length = len(command) if not group else length + len(command) + 1
+        group.append(command)
+    if group:
+        groups.append(group)
+    return groups
@@ -1,12 +1,47 @@
-import warnings
-
-import pyvisa as vi
+import contextlib
+import itertools
+import math
+import statistics
+import threading
 import time
+import warnings
 
 from .channel import Channel
+from .commands import QueryProxy, join_commands
+from .limiter import RateLimiter
+from .pipeline import CommandPipeline
+from .transport import VisaTransport, import_pyvisa
+from .tuning import TransferSettings, calibrate, load_transfer_settings, \
+    save_transfer_settings
+from .waveforms import MAX_WAVEFORM_LENGTH
 
 TRIGGER_SOURCE = {"timer": "TIM", "external": "EXT"}
 
+# Highest trigger rate in Hz fired from the host, faster trigger trains use
+# the trigger timer of the instrument
+MAX_SOFTWARE_TRIGGER_RATE = 200
+
+# Status byte bits of a non-empty error queue and the event status summary
+STATUS_ERROR_AVAILABLE = 4
+STATUS_EVENT_SUMMARY = 32
+
+# Standard events reported in the status byte: operation complete, query,
+# device dependent, execution and command error
+EVENT_STATUS_ENABLE = 61
+
+# Status byte bits requesting service: error available and event summary
+SERVICE_REQUEST_ENABLE = 36
+
+# Upper bound of errors read from the error queue at once
+MAX_ERRORS = 32
+
+# Internal setup memories usable with *SAV and *RCL
+SETUP_SLOTS = (0, 1, 2, 3, 4)
+
+# Channel properties read back to verify a recalled setup
+SETUP_PROPERTIES = ("signal_type", "frequency", "phase", "voltage_amplitude",
+                    "voltage_offset", "impedance")
+
 busy_resources = {}
 
 
@@ -18,6 +53,7 @@ def list_connected_devices():
         initialize a specific device via the resource parameter of
         :class:`.SignalGenerator`.
     """
+    vi = import_pyvisa()
     rm = vi.ResourceManager()
     resources = rm.list_resources()
     return resources
@@ -33,6 +69,7 @@ def get_device_id(resource):
     Returns:
         dict[str, str]: The 'Manufacturer', 'Model' and 'Serial Number'.
     """
+    vi = import_pyvisa()
     try:
         if resource not in busy_resources:
             rm = vi.ResourceManager()
@@ -79,22 +116,63 @@ class SignalGenerator:
 
     Supports the AFG 1022 and the AFG 31052.
 
+    All communication with the instrument is serialized, so one object can
+    be shared between several threads. A query and the error check
+    following it are never interleaved with commands of other threads.
+
     Attributes:
         channels (list): List of all channels.
         connected_device (str): The specific tektronix device which is
                                 connected.
+        setup_slots (dict): Names of the saved setups mapped to the internal
+                            setup memory they are stored in.
+        transfer_settings (TransferSettings): Chunk size and timeouts of
+                                              binary transfers.
     """
 
-    def __init__(self, resource=None):
+    def __init__(self, resource=None, rate_limiter=None, transport=None):
         """Class constructor. Open the connection to the instrument using the
-       VISA interface.
+       VISA interface or the given transport.
 
        Args:
            resource (str): Resource name of the instrument or product ID.
                            If not specified, first connected device returned by visa.
                            ResourceManager's list_resources method is used.
+           rate_limiter (RateLimiter): Pacing of the written commands. Can be
+                                       shared between several instruments.
+                                       If not specified, a limiter with an
+                                       interval of 0.1 s is created.
+           transport (Transport): Opened connection to the instrument, e.g.
+                                  a :class:`.SocketTransport`. If specified,
+                                  resource is ignored and VISA is not used.
        """
+        self._lock = threading.RLock()
+        # Error lists of the threads collecting errors, see collect_errors
+        self._error_sink = threading.local()
+        if rate_limiter is None:
+            rate_limiter = RateLimiter(0.1)
+        self.rate_limiter = rate_limiter
+
+        if transport is None:
+            transport = self._open_visa(resource)
+        self._instrument = transport
+
+        self.channels = [Channel(self, "1"), Channel(self, "2")]
+        self.connected_device = self.instrument_info.split(",")[1]
+        self.setup_slots = {}
+        self._setup_states = {}
+        self.pipeline = None
+        self.transfer_settings = load_transfer_settings(self.serial_number) \
+            or TransferSettings()
+        self.setup_status_reporting()
 
+    def _open_visa(self, resource):
+        """Open the connection to the instrument using the VISA interface.
+
+        Returns:
+            VisaTransport: The opened connection.
+        """
+        vi = import_pyvisa()
         # find the resource or set it to None, if the instr_id is not in the list
         self._resource_manager = vi.ResourceManager()
         resource_list = self._resource_manager.list_resources()
@@ -105,7 +183,7 @@ class SignalGenerator:
 
         connected_resource = None
         if visa_name is not None:
-            self._instrument = self._resource_manager.open_resource(visa_name)
+            instrument = self._resource_manager.open_resource(visa_name)
             connected_resource = visa_name
         else:
             connected = False
@@ -115,7 +193,7 @@ class SignalGenerator:
                 if len(parts) > 3 and 'USB' in parts[0] and (parts[1] == '1689' or parts[1] == '0x0699') and\
                         (parts[2] == '851' or parts[2] == '0x0353' or parts[2] == '856' or parts[2] == '0x0358'):
                     try:
-                        self._instrument = self._resource_manager.open_resource(resource_list[res_num])
+                        instrument = self._resource_manager.open_resource(resource_list[res_num])
                         connected = True
                         connected_resource = resource_list[res_num]
                         break
@@ -125,19 +203,111 @@ class SignalGenerator:
                 raise RuntimeError("Could not find any tektronix devices")
 
         if connected_resource is not None:
-            idn = self._instrument.query('*IDN?')
+            idn = instrument.query('*IDN?')
             parts = idn.split(',')
             resource_info = {'Manufacturer': parts[0], 'Model': parts[1], 'Serial Number': parts[2]}
             busy_resources[connected_resource] = resource_info
 
-        self.channels = [Channel(self, "1"), Channel(self, "2")]
-        self.connected_device = self.instrument_info.split(",")[1]
+        return VisaTransport(instrument)
 
     def reset(self):
         """Reset the instrument."""
         self.write("*RST")
         # Delay preventing a buffer overflow since reset operation takes time
-        time.sleep(0.5)
+        self.rate_limiter.hold(0.5)
+        self._forget_buffers()
+
+    def save_setup(self, name, slot=None):
+        """Store the current setup in an internal setup memory.
+
+        The setup can later be restored with :meth:`recall_setup`, which
+        takes a single command instead of setting every property again.
+
+        Args:
+            name (str): Name under which the setup can be recalled.
+            slot (int): Setup memory to use, see SETUP_SLOTS. If not
+                        specified, the slot already assigned to the name or
+                        the first unused slot is taken.
+
+        Returns:
+            int: The setup memory the setup was stored in.
+        """
+        with self._lock:
+            return self._save_setup(name, slot)
+
+    def _save_setup(self, name, slot):
+        if slot is None:
+            slot = self.setup_slots.get(name)
+        if slot is None:
+            used_slots = self.setup_slots.values()
+            slot = next((item for item in SETUP_SLOTS
+                         if item not in used_slots), None)
+            if slot is None:
+                raise ValueError("All setup memories are in use")
+        if slot not in SETUP_SLOTS:
+            raise ValueError("Setup memory has to be one of {}".format(
+                SETUP_SLOTS))
+        self.write("*SAV {}".format(slot))
+        # A slot can only hold one setup, drop names pointing to it
+        for old_name in [key for key, value in self.setup_slots.items()
+                         if value == slot]:
+            self.setup_slots.pop(old_name)
+            self._setup_states.pop(old_name, None)
+        self.setup_slots[name] = slot
+        self._setup_states[name] = self._read_setup_state()
+        return slot
+
+    def recall_setup(self, name, verify=True):
+        """Restore a setup stored with :meth:`save_setup`.
+
+        Args:
+            name (str): Name of the setup.
+            verify (bool): Read back the channel settings and compare them
+                           with the ones present when the setup was saved.
+                           A warning is issued for every deviation.
+
+        Returns:
+            dict: The channel settings after the recall, if verified.
+        """
+        with self._lock:
+            return self._recall_setup(name, verify)
+
+    def _recall_setup(self, name, verify):
+        if name not in self.setup_slots:
+            raise KeyError("No setup saved under the name {}".format(name))
+        self.write("*RCL {}".format(self.setup_slots[name]))
+        self._forget_buffers()
+        if not verify:
+            return None
+        state = self._read_setup_state()
+        expected = self._setup_states.get(name, {})
+        for key, value in state.items():
+            if key not in expected:
+                continue
+            if isinstance(value, float):
+                matches = math.isclose(value, expected[key], rel_tol=1e-6)
+            else:
+                matches = value == expected[key]
+            if not matches:
+                warnings.warn(
+                    "Recalled setup {}: {} of channel {} is {} instead of "
+                    "{}".format(name, key[1], key[0], value, expected[key]))
+        return state
+
+    def _forget_buffers(self):
+        """Drop the double buffer state after the functions were changed
+        by the instrument."""
+        for channel in self.channels:
+            channel._active_buffer = None
+
+    def _read_setup_state(self):
+        """Read the channel settings that describe a setup."""
+        state = {}
+        for channel in self.channels:
+            for property_name in SETUP_PROPERTIES:
+                state[(channel.channel_number, property_name)] = \
+                    getattr(channel, property_name)
+        return state
 
     def clear(self):
         """Clear event registers and error queue."""
@@ -147,19 +317,177 @@ class SignalGenerator:
         """Trigger signal generator."""
         self.write("*TRG")
 
+    def trigger_train(self, count, rate, channel_number="1"):
+        """Fire a train of triggers at a fixed rate.
+
+        The channel is armed in triggered burst mode. The triggers are sent
+        without pacing and the errors are only checked after the last one.
+        Other threads cannot communicate with the instrument during the
+        train.
+
+        Rates above MAX_SOFTWARE_TRIGGER_RATE are generated by the trigger
+        timer of the instrument instead, which is not supported by the
+        AFG1022. The timer is started and stopped from the host, so the
+        number of triggers is only approximate and only the start and stop
+        times are recorded.
+
+        Args:
+            count (int): Number of triggers.
+            rate (float): Trigger rate in Hz.
+            channel_number (str): Number of the channel to arm.
+
+        Returns:
+            dict: The host timestamps of the triggers in seconds
+            ('timestamps', based on :func:`time.perf_counter`), their
+            lateness compared to the schedule ('lateness'), the achieved
+            rate in Hz ('rate'), the standard deviation of the lateness in
+            seconds ('jitter'), the number of triggers fired a full period
+            or more late ('missed') and the trigger mode used ('mode',
+            'software' or 'timer').
+        """
+        if count < 1:
+            raise ValueError("At least one trigger has to be fired")
+        channel = self.channels[int(channel_number) - 1]
+        channel.burst_mode = "triggered"
+        channel.burst_on = True
+        if rate > MAX_SOFTWARE_TRIGGER_RATE:
+            return self._timer_trigger_train(count, rate)
+        if self.connected_device != "AFG1022":
+            self.trigger_source = "external"
+        period = 1 / rate
+        timestamps = []
+        with self._lock:
+            start = time.perf_counter()
+            for index in range(count):
+                delay = start + index * period - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self._instrument.write("*TRG")
+                timestamps.append(time.perf_counter())
+            self.error_check()
+        lateness = [timestamp - start - index * period
+                    for index, timestamp in enumerate(timestamps)]
+        if count > 1:
+            achieved_rate = (count - 1) / (timestamps[-1] - timestamps[0])
+        else:
+            achieved_rate = rate
+        return {"timestamps": timestamps, "lateness": lateness,
+                "rate": achieved_rate,
+                "jitter": statistics.pstdev(lateness),
+                "missed": sum(late >= period for late in lateness),
+                "mode": "software"}
+
+    def _timer_trigger_train(self, count, rate):
+        """Fire a trigger train using the trigger timer."""
+        if self.connected_device == "AFG1022":
+            raise ValueError("Trigger rates above {} Hz are not supported "
+                             "by the AFG1022".format(
+                                 MAX_SOFTWARE_TRIGGER_RATE))
+        self.trigger_timer = 1 / rate
+        with self._lock:
+            self._instrument.write("TRIG:SOUR TIM")
+            start = time.perf_counter()
+            time.sleep(count / rate)
+            self._instrument.write("TRIG:SOUR EXT")
+            stop = time.perf_counter()
+            self.error_check()
+        return {"timestamps": [start, stop], "lateness": [],
+                "rate": rate, "jitter": 0., "missed": 0, "mode": "timer"}
+
+    @property
+    def serial_number(self):
+        """Get the serial number of the instrument."""
+        return self.instrument_info.split(",")[2]
+
+    def calibrate_transfers(self, save=True):
+        """Benchmark the link and use the best binary transfer settings.
+
+        The content of the edit memory of the first channel is restored
+        afterwards.
+
+        Args:
+            save (bool): Store the settings for later sessions with this
+                         instrument.
+
+        Returns:
+            TransferSettings: The new settings.
+        """
+        self.transfer_settings = calibrate(self)
+        if save:
+            save_transfer_settings(self.serial_number,
+                                   self.transfer_settings)
+        return self.transfer_settings
+
     @property
     def instrument_info(self):
         """Get instrument information."""
-        return self._instrument.query("*IDN?")
+        with self._lock:
+            return self._instrument.query("*IDN?")
 
     def wait(self):
         """Prevent instrument from executing further commands until
-        all pending commands are complete."""
+        all pending commands are complete.
+
+        Does not block the host, see :meth:`wait_for_completion`.
+        """
         self.write("*WAI")
 
+    def wait_for_completion(self, timeout=10.):
+        """Block until all pending commands are complete.
+
+        Waits for a service request if the transport supports it and blocks
+        in an ``*OPC?`` query otherwise or on the AFG1022. The instrument is
+        not polled.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds.
+
+        Raises:
+            TimeoutError: If the commands are not complete in time.
+        """
+        self.rate_limiter.wait_hold()
+        with self._lock:
+            self._instrument.wait_for_completion(
+                timeout, service_request=self.connected_device != "AFG1022")
+            self.error_check()
+
+    def setup_status_reporting(self):
+        """Enable the status registers used to detect errors and completed
+        operations.
+
+        Errors and the operation complete event are summarized in the
+        status byte and raise a service request. Done on initialization,
+        has to be repeated if the registers are changed otherwise.
+
+        Only done for the AFG31000, the status byte of the AFG1022 is not
+        used.
+        """
+        if self.connected_device == "AFG1022":
+            return
+        self.write("*ESE {};*SRE {}".format(EVENT_STATUS_ENABLE,
+                                            SERVICE_REQUEST_ENABLE))
+
+    def start_pipeline(self, merge=True):
+        """Start a background worker for non-blocking commands.
+
+        Args:
+            merge (bool): Combine consecutive writes to compound messages.
+
+        Returns:
+            CommandPipeline: The running pipeline of the instrument. If one
+            is already running, it is returned instead.
+        """
+        if self.pipeline is None:
+            self.pipeline = CommandPipeline(self, merge=merge)
+        return self.pipeline
+
     def close(self):
         """Closes the instrument."""
-        self._instrument.close()
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline = None
+        with self._lock:
+            self._instrument.close()
 
     def error_check(self):
         """Checks for errors.
@@ -168,18 +496,67 @@ class SignalGenerator:
             ValueError: If an error occurs the error message will be
                 included in exception.
         """
-        # Used to clear the error bit in the device
-        if self.connected_device == "AFG31052":
-            self._instrument.query("*ESR?")
-        error = self._instrument.query("SYSTem:ERRor?")
-        error_code, error_message = error.split(",")
-        error_code = int(error_code)
-        # Ignore events
-        if self.connected_device == "AFG31052" and -899 <= error_code <= -500:
+        self._report_errors(self.read_errors())
+
+    @contextlib.contextmanager
+    def collect_errors(self):
+        """Collect the errors reported by the instrument instead of issuing
+        warnings.
+
+        Only affects the calling thread.
+
+        Yields:
+            list: The error messages reported while the context is active.
+        """
+        errors = []
+        previous = getattr(self._error_sink, "errors", None)
+        self._error_sink.errors = errors
+        try:
+            yield errors
+        finally:
+            self._error_sink.errors = previous
+
+    def _report_errors(self, errors):
+        """Issue a warning for every error or collect them."""
+        collected = getattr(self._error_sink, "errors", None)
+        if collected is not None:
+            collected.extend(errors)
             return
-        if error_code != 0:
+        for error_message in errors:
             warnings.warn(error_message)
 
+    def read_errors(self):
+        """Read all errors from the error queue.
+
+        On the AFG31000, the error queue is only read if the status byte
+        reports a pending error or event, so a single query suffices if
+        nothing happened. The error queue of the AFG1022 is always read.
+
+        Returns:
+            list: Error messages, empty if no error occurred.
+        """
+        errors = []
+        with self._lock:
+            if self.connected_device != "AFG1022":
+                status = int(self._instrument.query("*STB?"))
+                if not status & (STATUS_ERROR_AVAILABLE |
+                                 STATUS_EVENT_SUMMARY):
+                    return errors
+                # Used to clear the error bit in the device
+                self._instrument.query("*ESR?")
+            for _ in range(MAX_ERRORS):
+                error = self._instrument.query("SYSTem:ERRor?")
+                error_code, error_message = error.split(",", 1)
+                error_code = int(error_code)
+                if error_code == 0:
+                    break
+                # Ignore events
+                if self.connected_device == "AFG31052" and \
+                        -899 <= error_code <= -500:
+                    continue
+                errors.append(error_message.strip())
+        return errors
+
     def write_data_emom(self, data, memory=1):
         """Write arbitrary data to an edit memory.
 
@@ -197,9 +574,42 @@ class SignalGenerator:
         """
         if self.connected_device == "AFG1022":
             memory = ""
-        self._instrument.write_binary_values(
-            "DATA:DATA EMEM{},".format(memory), data, datatype="h",
-            is_big_endian=True)
+        self.write_binary_values("DATA:DATA EMEM{},".format(memory), data)
+
+    def write_binary_values(self, message, data):
+        """Write a message followed by a block of big endian int16 values.
+
+        Args:
+            message (str): The command preceding the block.
+            data (numpy.ndarray): The values.
+        """
+        self.rate_limiter.wait()
+        with self._lock, self._tuned_transfer(2 * len(data)):
+            self._instrument.write_binary_values(
+                message, data, datatype="h", is_big_endian=True)
+
+    def write_data_emom_stream(self, chunks, length, memory=1):
+        """Write arbitrary data to an edit memory chunk by chunk.
+
+        The chunks are sent as they are produced, so the data never has to
+        be held in memory at once.
+
+        Args:
+            chunks (iterable): Data as big endian int16 bytes, e.g. from
+                               :func:`.encode_stream`.
+            length (int): Total number of values in the chunks.
+            memory(int): Memory to which should be written. Ignored when
+                         connected device is an AFG1022. Else determines
+                         channel number the signal is available on.
+        """
+        if self.connected_device == "AFG1022":
+            memory = ""
+        size = str(2 * length)
+        header = "DATA:DATA EMEM{},#{}{}".format(memory, len(size), size)
+        self.rate_limiter.wait()
+        with self._lock, self._tuned_transfer(2 * length):
+            self._instrument.write_stream(
+                itertools.chain([header.encode()], chunks, [b"\n"]))
 
     def read_data_emom(self, memory=1):
         """Read arbitrary data from an edit memory.
@@ -215,9 +625,41 @@ class SignalGenerator:
         """
         if self.connected_device == "AFG1022":
             memory = ""
-        return self._instrument.query_binary_values(
-            "DATA:DATA? EMEM{}".format(memory),
-            datatype="h", is_big_endian=True)
+        max_size = 2 * MAX_WAVEFORM_LENGTH[self.connected_device]
+        self.rate_limiter.wait_hold()
+        with self._lock, self._tuned_transfer(max_size) as transfer:
+            data = self._instrument.query_binary_values(
+                "DATA:DATA? EMEM{}".format(memory),
+                datatype="h", is_big_endian=True)
+            transfer["size"] = 2 * len(data)
+        return data
+
+    @contextlib.contextmanager
+    def _tuned_transfer(self, size):
+        """Adapt chunk size and timeout of the transport to a binary
+        transfer and measure its throughput.
+
+        The chunk size of a :class:`.VisaTransport` only applies to reads.
+
+        Args:
+            size (int): Expected payload in bytes.
+
+        Yields:
+            dict: The 'size' of the payload, can be corrected if it is
+            only known after the transfer.
+        """
+        instrument = self._instrument
+        previous = instrument.chunk_size, instrument.timeout
+        instrument.chunk_size = self.transfer_settings.chunk_size_for(size)
+        instrument.timeout = self.transfer_settings.timeout_for(size)
+        transfer = {"size": size}
+        start = time.perf_counter()
+        try:
+            yield transfer
+        finally:
+            instrument.chunk_size, instrument.timeout = previous
+        self.transfer_settings.record(transfer["size"],
+                                      time.perf_counter() - start)
 
     @property
     def trigger_source(self):
@@ -258,6 +700,68 @@ class SignalGenerator:
             raise NotImplementedError
         self.write("TRIG:TIM {}".format(value))
 
+    def get_many(self, *names):
+        """Read several properties with one compound query.
+
+        The queries of the getters are recorded by running them with the
+        answer "1". Getters whose queries depend on earlier answers are
+        run again with the responses, and the queries they ask in addition
+        are sent in a further compound query, until every getter ran on
+        the responses to its own queries. The responses are converted like
+        the properties do and the errors are checked once per message.
+
+        Args:
+            *names: Names of generator properties or tuples of a channel
+                    number and the name of a channel property, e.g.
+                    ("1", "frequency").
+
+        Returns:
+            dict: The values with the given names as keys.
+        """
+        requests = [(None, name) if isinstance(name, str) else
+                    (str(name[0]), name[1]) for name in names]
+        # Queries of each getter answered so far and their responses
+        answered = [[] for _ in requests]
+        values = {}
+        pending = list(range(len(requests)))
+        while pending:
+            queries = []
+            owners = []
+            for index in list(pending):
+                channel_number, name = requests[index]
+                asked = []
+
+                def replay(query, known=answered[index], asked=asked,
+                           calls=itertools.count()):
+                    position = next(calls)
+                    if not asked and position < len(known) and \
+                            known[position][0] == query:
+                        return known[position][1]
+                    # Responses after a differing query do not apply
+                    del known[position:]
+                    asked.append(query)
+                    return "1"
+
+                recorder = QueryProxy(self, replay)
+                try:
+                    value = recorder.read(name, channel_number)
+                except Exception:
+                    # Raised on the placeholder answers, not on responses
+                    if not asked:
+                        raise
+                if asked:
+                    queries += asked
+                    owners += [index] * len(asked)
+                else:
+                    values[names[index]] = value
+                    pending.remove(index)
+            responses = []
+            for message in join_commands(queries):
+                responses += self.query(message).replace("\n", "").split(";")
+            for index, query, response in zip(owners, queries, responses):
+                answered[index].append((query, response))
+        return values
+
     def query_int(self, query_string):
         """Query from the signal generator and return type as int."""
         return int(
@@ -278,13 +782,44 @@ class SignalGenerator:
 
     def query(self, query_string):
         """Query from the instrument."""
-        query = self._instrument.query(query_string)
-        self.error_check()
+        query, errors = self._query_message(query_string)
+        self._report_errors(errors)
         return query
 
     def write(self, write_string):
         """Write a string to the instrument."""
-        self._instrument.write(write_string)
-        # Add a delay to prevent too many writes to the instrument
-        time.sleep(0.10)
-        self.error_check()
+        self._report_errors(self._write_message(write_string))
+
+    def write_many(self, commands):
+        """Write several commands combined to compound messages.
+
+        The errors are checked once per message instead of once per command.
+
+        Args:
+            commands (list): Commands to write in order.
+        """
+        for message in join_commands(commands):
+            self.write(message)
+
+    def _query_message(self, query_string):
+        """Query and read the error queue in one atomic step.
+
+        Returns:
+            tuple: The response and the list of error messages.
+        """
+        self.rate_limiter.wait_hold()
+        with self._lock:
+            query = self._instrument.query(query_string)
+            return query, self.read_errors()
+
+    def _write_message(self, write_string):
+        """Write and read the error queue in one atomic step.
+
+        Returns:
+            list: Error messages.
+        """
+        # Wait for a free slot to prevent too many writes to the instrument
+        self.rate_limiter.wait()
+        with self._lock:
+            self._instrument.write(write_string)
+            return self.read_errors()
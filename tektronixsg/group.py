@@ -0,0 +1,109 @@
+"""Channels of a signal generator configured together."""
+import math
+
+from .commands import record_setting
+
+# Signal types inverted by a phase shift of pi
+MIRRORED_SIGNAL_TYPES = ("sine", "square")
+
+
+class ChannelGroup:
+    """Group of channels which are configured and started together.
+
+    All settings of a call are sent as one compound message, so the
+    channels are changed with minimal skew.
+
+    Attributes:
+        generator: Reference of :class:`.SignalGenerator`.
+        channel_numbers (tuple): Numbers of the grouped channels.
+    """
+    def __init__(self, generator, channel_numbers=("1", "2")):
+        """Initialize the channel group.
+
+        Args:
+            generator: Reference of the :class:`.SignalGenerator` object.
+            channel_numbers (tuple): Numbers of the channels to group.
+        """
+        self.generator = generator
+        self.channel_numbers = tuple(str(number) for number in
+                                     channel_numbers)
+
+    def set(self, mirrored=False, **settings):
+        """Apply settings to all channels of the group.
+
+        Args:
+            mirrored (bool): Apply the settings to the first channel and
+                             the inverted signal to the other channels. The
+                             phase is shifted by pi and the voltage offset
+                             is negated. The phase of the first channel is
+                             set to 0 unless given. This only inverts
+                             sine and square signals, the signal type
+                             already selected is not checked if no
+                             signal_type is given.
+            **settings: Channel properties and their values, applied in
+                        the given order.
+
+        Raises:
+            ValueError: If a mirrored signal type cannot be inverted by a
+                        phase shift or voltage_max or voltage_min are
+                        given with mirrored set.
+        """
+        if mirrored:
+            if settings.get("signal_type", "sine") not in \
+                    MIRRORED_SIGNAL_TYPES:
+                raise ValueError("Only {} signals can be mirrored".format(
+                    " and ".join(MIRRORED_SIGNAL_TYPES)))
+            if "voltage_max" in settings or "voltage_min" in settings:
+                raise ValueError("Use voltage_amplitude and voltage_offset "
+                                 "to mirror signals")
+            settings = dict(settings)
+            settings.setdefault("phase", 0)
+        channel_settings = [settings]
+        for _ in self.channel_numbers[1:]:
+            if mirrored:
+                channel_settings.append(_mirror(settings))
+            else:
+                channel_settings.append(settings)
+        self.configure(*channel_settings)
+
+    def configure(self, *channel_settings):
+        """Apply individual settings to the channels of the group.
+
+        Args:
+            *channel_settings (dict): Channel properties and their values,
+                                      one dictionary per grouped channel.
+        """
+        if len(channel_settings) != len(self.channel_numbers):
+            raise ValueError("Expected settings for {} channels".format(
+                len(self.channel_numbers)))
+        commands = []
+        for channel_number, settings in zip(self.channel_numbers,
+                                            channel_settings):
+            for name, value in settings.items():
+                commands += record_setting(self.generator, name, value,
+                                           channel_number)
+        self.generator.write_many(commands)
+
+    def start(self):
+        """Align the phases and enable the outputs of all channels at once.
+        """
+        commands = ["SOUR1:PHAS:INIT"]
+        commands += ["OUTP{} 1".format(channel_number)
+                     for channel_number in self.channel_numbers]
+        self.generator.write_many(commands)
+
+    def stop(self):
+        """Disable the outputs of all channels at once."""
+        self.generator.write_many(
+            ["OUTP{} 0".format(channel_number)
+             for channel_number in self.channel_numbers])
+
+
+def _mirror(settings):
+    """Settings generating the inverted signal."""
+    mirrored = dict(settings)
+    if "voltage_offset" in mirrored:
+        mirrored["voltage_offset"] = -mirrored["voltage_offset"]
+    phase = mirrored.get("phase", 0)
+    mirrored["phase"] = phase + math.pi if phase <= 0 else phase - math.pi
+    return mirrored
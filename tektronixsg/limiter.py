@@ -0,0 +1,69 @@
+"""Pacing of the commands sent to a signal generator."""
+import threading
+import time
+
+
+class RateLimiter:
+    """Enforce a minimum interval between consecutive commands.
+
+    The limiter hands out time slots in the order the callers arrive, so
+    threads sharing one limiter are served first come, first served and
+    every caller only waits for the slots reserved before its own. A single
+    limiter may be shared between several :class:`.SignalGenerator` objects
+    which are connected to the same bus.
+
+    Attributes:
+        interval (float): Minimum time between two commands in seconds.
+    """
+    def __init__(self, interval=0.1):
+        """Initialize the rate limiter.
+
+        Args:
+            interval (float): Minimum time between two commands in seconds.
+        """
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.
+        self._hold_end = 0.
+
+    def reserve(self):
+        """Reserve the next free time slot.
+
+        Returns:
+            float: Time of the reserved slot, based on
+            :func:`time.monotonic`.
+        """
+        with self._lock:
+            slot = max(time.monotonic(), self._next_slot)
+            self._next_slot = slot + self.interval
+        return slot
+
+    def wait(self):
+        """Block until the next free time slot is reached."""
+        delay = self.reserve() - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def hold(self, duration):
+        """Keep the slots free for a given time after the last reserved slot.
+
+        Used after commands which take the instrument a while to process.
+        Queries also wait for the end of the hold, see :meth:`wait_hold`.
+
+        Args:
+            duration (float): Time in seconds.
+        """
+        with self._lock:
+            self._next_slot = max(time.monotonic(), self._next_slot) + \
+                duration
+            self._hold_end = self._next_slot
+
+    def wait_hold(self):
+        """Block until the last hold is over.
+
+        Unlike :meth:`wait`, no slot is reserved, so queries are not paced
+        but do not reach the instrument while it is still busy.
+        """
+        delay = self._hold_end - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,228 @@
+"""Non-blocking command queue for a signal generator."""
+from concurrent.futures import Future
+import queue
+import threading
+
+from .commands import group_commands, record_setting
+
+# Queued by close to stop the worker
+_STOP = object()
+
+
+class _Item:
+    """Queued piece of work and the future for its result."""
+    def __init__(self, commands=None, function=None):
+        self.commands = commands
+        self.function = function
+        self.future = Future()
+
+
+class CommandPipeline:
+    """Background worker sending commands to a signal generator in order.
+
+    All methods return immediately with a :class:`concurrent.futures.Future`.
+    The worker processes the queue in order. Consecutive writes are combined
+    to compound messages and the error queue is read once per message.
+    Errors reported by the instrument are set as :class:`ValueError` on the
+    futures of the commands sent in that message. With merging disabled,
+    every error is attached to exactly the command that caused it. Errors
+    reported while reading properties or running functions are set on
+    their futures as well.
+
+    Attributes:
+        generator: Reference of :class:`.SignalGenerator`.
+        merge (bool): Whether consecutive writes are combined.
+    """
+    def __init__(self, generator, merge=True):
+        """Initialize the pipeline and start the worker thread.
+
+        Args:
+            generator: Reference of the :class:`.SignalGenerator` object.
+            merge (bool): Combine consecutive writes to compound messages.
+        """
+        self.generator = generator
+        self.merge = merge
+        self._queue = queue.Queue()
+        # Held while queueing, so nothing is queued behind the stop marker
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, write_string):
+        """Queue a command.
+
+        Returns:
+            concurrent.futures.Future: Resolves to None once written.
+        """
+        return self._put(_Item(commands=[write_string]))
+
+    def set(self, name, value, channel_number=None):
+        """Queue setting a property.
+
+        Args:
+            name (str): Name of the property.
+            value: Value to set.
+            channel_number (str): Number of the channel owning the property.
+                                  If not specified, the property of the
+                                  generator is set.
+
+        Returns:
+            concurrent.futures.Future: Resolves to None once written.
+        """
+        commands = record_setting(self.generator, name, value,
+                                  channel_number)
+        return self._put(_Item(commands=commands))
+
+    def query(self, query_string):
+        """Queue a query.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the response without the
+            line termination.
+        """
+        return self._put(_Item(
+            function=lambda: self._query(query_string)))
+
+    def get(self, name, channel_number=None):
+        """Queue reading a property.
+
+        Args:
+            name (str): Name of the property.
+            channel_number (str): Number of the channel owning the property.
+                                  If not specified, the property of the
+                                  generator is read.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the property value.
+        """
+        if channel_number is None:
+            target = self.generator
+        else:
+            target = self.generator.channels[int(channel_number) - 1]
+        return self.call(getattr, target, name)
+
+    def call(self, function, *args, **kwargs):
+        """Queue an arbitrary function, e.g. a method of the generator.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the return value.
+        """
+        return self._put(_Item(
+            function=lambda: function(*args, **kwargs)))
+
+    def close(self, wait=True):
+        """Stop the worker after the queued work is done.
+
+        No work can be queued afterwards.
+
+        Args:
+            wait (bool): Block until the worker has finished.
+        """
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(_STOP)
+        if wait:
+            self._thread.join()
+
+    def _put(self, item):
+        with self._close_lock:
+            if self._closed or not self._thread.is_alive():
+                raise RuntimeError("The pipeline is closed")
+            self._queue.put(item)
+        return item.future
+
+    def _query(self, query_string):
+        response, errors = self.generator._query_message(query_string)
+        if errors:
+            raise ValueError("; ".join(errors))
+        return response.replace("\n", "")
+
+    def _run(self):
+        try:
+            self._process()
+        finally:
+            # Fail the work left in the queue, e.g. if the worker died
+            with self._close_lock:
+                self._closed = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP and \
+                        item.future.set_running_or_notify_cancel():
+                    item.future.set_exception(
+                        RuntimeError("The pipeline is closed"))
+
+    def _process(self):
+        pending = None
+        while True:
+            item = pending if pending is not None else self._queue.get()
+            pending = None
+            if item is _STOP:
+                return
+            if item.function is not None:
+                self._execute(item)
+                continue
+            batch = [item]
+            while self.merge:
+                try:
+                    pending = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is _STOP or pending.commands is None:
+                    break
+                batch.append(pending)
+                pending = None
+            self._send(batch)
+
+    def _execute(self, item):
+        if not item.future.set_running_or_notify_cancel():
+            return
+        try:
+            with self.generator.collect_errors() as errors:
+                result = item.function()
+            if errors:
+                raise ValueError("; ".join(errors))
+        except Exception as error:
+            item.future.set_exception(error)
+        else:
+            item.future.set_result(result)
+
+    def _send(self, batch):
+        batch = [item for item in batch
+                 if item.future.set_running_or_notify_cancel()]
+        commands = []
+        owners = []
+        for item in batch:
+            commands += item.commands
+            owners += [item] * len(item.commands)
+        errors = {id(item): [] for item in batch}
+        position = 0
+        try:
+            for group in group_commands(commands):
+                message_errors = self.generator._write_message(
+                    ";".join(group))
+                # Errors belong to the items with commands in the message
+                for item in {id(owner): owner for owner in
+                             owners[position:position + len(group)]}.values():
+                    errors[id(item)] += message_errors
+                position += len(group)
+        except Exception as error:
+            for item in batch:
+                item.future.set_exception(error)
+            return
+        for item in batch:
+            if errors[id(item)]:
+                item.future.set_exception(
+                    ValueError("; ".join(errors[id(item)])))
+            else:
+                item.future.set_result(None)
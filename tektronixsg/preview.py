@@ -0,0 +1,159 @@
+"""Host-side model of the signal output by a channel."""
+import numpy as np
+
+from .waveforms import MAX_DATA_VALUE
+
+# Channel properties read for a preview, the model specific ones are only
+# read if the instrument supports them
+PREVIEW_PROPERTIES = ("output_on", "signal_type", "frequency", "phase",
+                      "voltage_amplitude", "voltage_offset", "pulse_duty",
+                      "modulation")
+PREVIEW_PROPERTIES_AFG31000 = ("pulse_width", "pulse_delay", "pulse_period",
+                               "pulse_leading_transition",
+                               "pulse_trailing_transition", "burst_delay")
+PREVIEW_PROPERTIES_BURST = ("burst_on", "burst_mode", "burst_cycles")
+
+
+def read_configuration(channel, read_memory=True):
+    """Read the settings of a channel needed for a preview.
+
+    All properties are read with one compound query.
+
+    Args:
+        channel: The :class:`.Channel` to read.
+        read_memory (bool): Also read the edit memory if an arbitrary signal
+                            is output.
+
+    Returns:
+        dict: The channel properties, and the edit memory data as 'memory'
+        if it was read.
+
+    Raises:
+        NotImplementedError: If the channel outputs a signal type without a
+                             name, e.g. a buffer file or a sequence.
+    """
+    generator = channel.generator
+    names = list(PREVIEW_PROPERTIES)
+    if generator.connected_device != "AFG1022":
+        names += PREVIEW_PROPERTIES_AFG31000
+    if generator.connected_device != "AFG1022" or \
+            channel.channel_number == "1":
+        names += PREVIEW_PROPERTIES_BURST
+    configuration = channel.get(*names)
+    signal_type = configuration["signal_type"]
+    if signal_type is None:
+        raise NotImplementedError("The signal type of channel {} cannot be "
+                                  "previewed".format(channel.channel_number))
+    if read_memory and signal_type.startswith("memory"):
+        configuration["memory"] = generator.read_data_emom(
+            int(signal_type[len("memory"):]))
+    return configuration
+
+
+def render(configuration, times, triggers=(0.,), gates=None):
+    """Compute the expected output voltage of a channel.
+
+    Sine, square, ramp, pulse, DC and arbitrary signals are modelled
+    ideally: the output is assumed to be terminated with the configured
+    impedance, and modulations and filtering are not modelled. The linear
+    pulse edges are centered on the points defining the pulse width. The
+    edit memory is played sample and hold with one period per memory
+    length. In burst mode, each burst starts at the configured phase and
+    the output holds the start value of the signal in between.
+
+    Args:
+        configuration (dict): Channel properties as returned by
+                              :func:`read_configuration` or
+                              :meth:`.Channel.get`. Arbitrary signals
+                              require the edit memory data as 'memory'.
+        times (numpy.ndarray): Times in seconds to compute the output at.
+        triggers (list): Trigger times in seconds of a triggered burst.
+        gates (list): Start and stop times in seconds of the gate of a
+                      gated burst. Defaults to a gate open all the time.
+
+    Returns:
+        numpy.ndarray: The output voltage at the given times.
+    """
+    times = np.asarray(times, dtype=float)
+    if not configuration.get("output_on", True):
+        return np.zeros_like(times)
+    if configuration.get("modulation") is not None:
+        raise NotImplementedError("Modulated signals cannot be previewed")
+    mode = configuration.get("burst_mode", "triggered")
+    if not configuration.get("burst_on", False) or \
+            (mode == "gated" and gates is None):
+        return _scale(configuration, _shape(configuration, times))
+    if mode == "triggered":
+        length = configuration.get("burst_cycles", 1) / \
+            configuration["frequency"]
+        starts = np.sort(np.asarray(triggers, dtype=float)) + \
+            configuration.get("burst_delay", 0.)
+        stops = starts + length
+    else:
+        gates = np.asarray(sorted(gates), dtype=float).reshape(-1, 2)
+        starts, stops = gates[:, 0], gates[:, 1]
+    # Index of the last burst started at each time
+    burst = np.maximum(np.searchsorted(starts, times, side="right") - 1, 0)
+    elapsed = times - starts[burst]
+    active = (elapsed >= 0) & (times < stops[burst])
+    if configuration["signal_type"] == "pulse":
+        idle = -1.
+    else:
+        idle = _shape(configuration, np.zeros(1))[0]
+    return _scale(configuration, np.where(
+        active, _shape(configuration, elapsed), idle))
+
+
+def _scale(configuration, shape):
+    """Convert a signal normalized to -1 to 1 to Volt."""
+    return configuration.get("voltage_offset", 0.) + \
+        configuration.get("voltage_amplitude", 1.) / 2 * shape
+
+
+def _shape(configuration, times):
+    """Compute the signal normalized to -1 to 1."""
+    signal_type = configuration["signal_type"]
+    if signal_type == "dc":
+        return np.zeros_like(times)
+    if signal_type == "pulse":
+        return _pulse(configuration, times)
+    cycles = times * configuration["frequency"] + \
+        configuration.get("phase", 0.) / (2 * np.pi)
+    position = cycles - np.floor(cycles)
+    if signal_type == "sine":
+        return np.sin(2 * np.pi * position)
+    if signal_type == "square":
+        return np.where(position < 0.5, 1., -1.)
+    if signal_type == "ramp":
+        return 2 * position - 1
+    if signal_type.startswith("memory"):
+        memory = np.asarray(configuration["memory"], dtype=float)
+        index = (position * len(memory)).astype(int)
+        return 2 * memory[np.minimum(index, len(memory) - 1)] / \
+            MAX_DATA_VALUE - 1
+    raise NotImplementedError(
+        "Signal type {} cannot be previewed".format(signal_type))
+
+
+def _pulse(configuration, times):
+    """Compute a pulse signal normalized to -1 to 1."""
+    period = configuration.get("pulse_period", 1 / configuration["frequency"])
+    width = configuration.get("pulse_width")
+    if width is None:
+        width = configuration["pulse_duty"] / 100 * period
+    leading = configuration.get("pulse_leading_transition", 0.)
+    trailing = configuration.get("pulse_trailing_transition", 0.)
+    # Time since the middle of the last leading edge, starting at the
+    # beginning of the edge so a pulse is never split between periods
+    elapsed = np.mod(times - configuration.get("pulse_delay", 0.) +
+                     leading / 2, period) - leading / 2
+    level = np.minimum(_edge(elapsed, leading),
+                       _edge(width - elapsed, trailing))
+    return 2 * level - 1
+
+
+def _edge(elapsed, duration):
+    """Compute a linear edge centered at zero rising from 0 to 1."""
+    if duration <= 0:
+        return (elapsed >= 0).astype(float)
+    return np.clip(elapsed / duration + 0.5, 0., 1.)
@@ -0,0 +1,200 @@
+"""Sequences of arbitrary waveforms played by the AFG31000.
+
+In the sequence mode of the AFG31000, the instrument steps through a list
+of waveforms on its own. The waveforms are uploaded once, every entry of
+the sequence repeats one of them, can wait for a trigger and jump to
+another entry.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from .waveforms import MAX_DATA_VALUE
+
+# Maximum number of sequence entries
+MAX_SEQUENCE_ENTRIES = {"AFG31052": 256}
+
+# Maximum number of waveform points per channel in sequence mode
+MAX_SEQUENCE_POINTS = {"AFG31052": 16 * 2 ** 20}
+
+# Maximum repeat count of an entry
+MAX_REPEAT = 1000000
+
+JUMP_TARGETS = {"next": "NEXT", "first": "FIRS", "index": "IND"}
+
+
+class SequenceEntry:
+    """Entry of a :class:`Sequence`.
+
+    Attributes:
+        waveform (str): Name of the waveform played.
+        repeat (int): Number of repetitions, None repeats infinitely.
+        wait_trigger (bool): Wait for a trigger before playing the entry.
+        jump (str): Target of a jump event, see JUMP_TARGETS.
+        jump_index (int): Entry jumped to, if the target is "index".
+        goto (int): Entry played next instead of the following one.
+    """
+    def __init__(self, waveform, repeat=1, wait_trigger=False, jump="next",
+                 jump_index=None, goto=None):
+        self.waveform = waveform
+        self.repeat = repeat
+        self.wait_trigger = wait_trigger
+        self.jump = jump
+        self.jump_index = jump_index
+        self.goto = goto
+
+
+class Sequence:
+    """Sequence of arbitrary waveforms played without host involvement.
+
+    Only supported by the AFG31000 series.
+
+    Attributes:
+        generator: Reference of :class:`.SignalGenerator`.
+        waveforms (OrderedDict): Voltage vectors with their names as keys.
+        entries (list): The :class:`SequenceEntry` objects in order. Entry
+                        indices used for jumps start at 1.
+    """
+    def __init__(self, generator):
+        """Initialize an empty sequence.
+
+        Args:
+            generator: Reference of the :class:`.SignalGenerator` object.
+        """
+        if generator.connected_device not in MAX_SEQUENCE_ENTRIES:
+            raise NotImplementedError
+        self.generator = generator
+        self.waveforms = OrderedDict()
+        self.entries = []
+
+    def add_waveform(self, name, voltage_vector):
+        """Add a waveform which can be used by the entries.
+
+        Args:
+            name (str): Name of the waveform.
+            voltage_vector (numpy.ndarray): Voltage vector as numpy array.
+        """
+        voltage_vector = np.asarray(voltage_vector, dtype=float)
+        if len(voltage_vector) < 2:
+            raise ValueError("Minimum waveform length is 2")
+        self.waveforms[name] = voltage_vector
+
+    def add_entry(self, waveform, repeat=1, wait_trigger=False, jump="next",
+                  jump_index=None, goto=None):
+        """Append an entry.
+
+        Args:
+            waveform (str): Name of the waveform played.
+            repeat (int): Number of repetitions, None repeats infinitely.
+            wait_trigger (bool): Wait for a trigger before playing the
+                                 entry.
+            jump (str): Target of a jump event, see JUMP_TARGETS.
+            jump_index (int): Entry jumped to, if the target is "index".
+            goto (int): Entry played next instead of the following one.
+
+        Returns:
+            int: Index of the entry, starting at 1.
+        """
+        self.entries.append(SequenceEntry(waveform, repeat, wait_trigger,
+                                          jump, jump_index, goto))
+        return len(self.entries)
+
+    def validate(self):
+        """Check the sequence against the limits of the connected model.
+
+        Raises:
+            ValueError: If the sequence cannot be played.
+        """
+        model = self.generator.connected_device
+        if not self.entries:
+            raise ValueError("The sequence has no entries")
+        if len(self.entries) > MAX_SEQUENCE_ENTRIES[model]:
+            raise ValueError("Maximum number of entries is {}".format(
+                MAX_SEQUENCE_ENTRIES[model]))
+        points = sum(len(vector) for vector in self.waveforms.values())
+        if points > MAX_SEQUENCE_POINTS[model]:
+            raise ValueError("Maximum number of waveform points is "
+                             "{}".format(MAX_SEQUENCE_POINTS[model]))
+        for index, entry in enumerate(self.entries, 1):
+            if entry.waveform not in self.waveforms:
+                raise ValueError("Entry {} uses the unknown waveform "
+                                 "{}".format(index, entry.waveform))
+            if entry.repeat is not None and \
+                    not 1 <= entry.repeat <= MAX_REPEAT:
+                raise ValueError("Repeat count of entry {} has to be "
+                                 "between 1 and {}".format(index,
+                                                           MAX_REPEAT))
+            if entry.jump not in JUMP_TARGETS:
+                raise ValueError("Unknown jump target {} of entry "
+                                 "{}".format(entry.jump, index))
+            targets = [entry.goto]
+            if entry.jump == "index":
+                if entry.jump_index is None:
+                    raise ValueError("Entry {} jumps to an index, but has "
+                                     "none".format(index))
+                targets.append(entry.jump_index)
+            for target in targets:
+                if target is not None and \
+                        not 1 <= target <= len(self.entries):
+                    raise ValueError("Entry {} refers to the missing entry "
+                                     "{}".format(index, target))
+
+    def upload(self, channel_number="1"):
+        """Validate the sequence and transfer it to the instrument.
+
+        All waveforms are encoded with a common voltage range, which is set
+        as amplitude and offset of the channel.
+
+        Args:
+            channel_number (str): Number of the channel playing the
+                                  sequence.
+        """
+        self.validate()
+        min_voltage = min(vector.min() for vector in self.waveforms.values())
+        max_voltage = max(vector.max() for vector in self.waveforms.values())
+        voltage_range = max_voltage - min_voltage
+        self.generator.write_many(["SEQC:STAT 1", "SEQ:NEW"])
+        for name, vector in self.waveforms.items():
+            if voltage_range == 0:
+                data = np.zeros(len(vector), dtype=np.int16)
+            else:
+                data = (MAX_DATA_VALUE * (vector - min_voltage) /
+                        voltage_range).astype(np.int16)
+            self.generator.write('WLIS:WAV:NEW "{}",{}'.format(name,
+                                                               len(data)))
+            self.generator.write_binary_values(
+                'WLIS:WAV:DATA "{}",'.format(name), data)
+        commands = ["SEQ:LENG {}".format(len(self.entries))]
+        for index, entry in enumerate(self.entries, 1):
+            prefix = "SEQ:ELEM{}".format(index)
+            commands.append('{}:WAV{} "{}"'.format(prefix, channel_number,
+                                                   entry.waveform))
+            if entry.repeat is None:
+                commands.append("{}:LOOP:INF 1".format(prefix))
+            else:
+                commands += ["{}:LOOP:INF 0".format(prefix),
+                             "{}:LOOP:COUN {}".format(prefix, entry.repeat)]
+            commands.append("{}:TWA {}".format(prefix,
+                                               int(entry.wait_trigger)))
+            commands.append("{}:JTAR:TYPE {}".format(
+                prefix, JUMP_TARGETS[entry.jump]))
+            if entry.jump == "index":
+                commands.append("{}:JTAR:IND {}".format(prefix,
+                                                        entry.jump_index))
+            commands.append("{}:GOTO:STAT {}".format(
+                prefix, int(entry.goto is not None)))
+            if entry.goto is not None:
+                commands.append("{}:GOTO:IND {}".format(prefix, entry.goto))
+        commands += [
+            "SOUR{}:VOLT {}".format(channel_number, voltage_range),
+            "SOUR{}:VOLT:OFFS {}".format(channel_number,
+                                         (max_voltage + min_voltage) / 2)]
+        self.generator.write_many(commands)
+
+    def run(self):
+        """Start playing the uploaded sequence."""
+        self.generator.write("SEQC:RUN:IMM")
+
+    def stop(self):
+        """Stop playing the sequence."""
+        self.generator.write("SEQC:STOP")
@@ -0,0 +1,342 @@
+"""Server sharing signal generators between processes.
+
+Only one process can open a USB instrument at a time. The
+:class:`InstrumentServer` owns the sessions and executes the requests of
+any number of local clients. The requests of all clients are passed
+through one :class:`.CommandPipeline` per instrument, which keeps their
+order and combines consecutive writes. Large arrays are handed over in
+shared memory instead of being sent through the socket, in both
+directions.
+
+Requests are exchanged as pickles, so a client able to connect can run
+arbitrary code in the server process. The server therefore requires an
+authentication key when listening on TCP.
+
+Clients use :class:`RemoteSignalGenerator`, which offers the same
+properties and methods as :class:`.SignalGenerator`.
+"""
+from multiprocessing.connection import Client, Listener
+from multiprocessing import resource_tracker, shared_memory
+import os
+import sys
+import threading
+
+import numpy as np
+
+from .channel import Channel
+from .generator import SignalGenerator
+
+# Arrays larger than this number of bytes are handed over in shared memory
+SHARED_MEMORY_THRESHOLD = 64 * 1024
+
+# Names of the shared memory blocks created by this process
+_created_blocks = set()
+
+
+class SharedArray:
+    """Reference to an array placed in shared memory.
+
+    Attributes:
+        name (str): Name of the shared memory block.
+        shape (tuple): Shape of the array.
+        dtype (str): Data type of the array.
+        is_list (bool): Whether the array is handed back as a list.
+    """
+    def __init__(self, name, shape, dtype, is_list=False):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.is_list = is_list
+
+
+class InstrumentServer:
+    """Server executing the requests of clients on signal generators.
+
+    Attributes:
+        address: Address the server listens on, a path for a Unix socket or
+                 a (host, port) tuple for TCP.
+        sessions (dict): Opened generators with their serial number as key.
+    """
+    def __init__(self, address, authkey=None):
+        """Initialize the server and start listening.
+
+        Args:
+            address: Path of a Unix socket or (host, port) tuple for TCP.
+            authkey (bytes): Key clients have to authenticate with.
+                             Required when listening on TCP.
+
+        Raises:
+            ValueError: If a TCP address is given without a key.
+        """
+        if isinstance(address, tuple) and not authkey:
+            raise ValueError("An authkey is required to listen on TCP")
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self.sessions = {}
+        self._default_serial = None
+        self._lock = threading.Lock()
+        # Held while opening an instrument, so it is only opened once
+        self._open_lock = threading.Lock()
+        self._running = True
+
+    def serve_forever(self):
+        """Accept clients until :meth:`close` is called."""
+        while self._running:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                if not self._running:
+                    return
+                continue
+            threading.Thread(target=self._serve_client, args=(connection,),
+                             daemon=True).start()
+
+    def close(self):
+        """Stop accepting clients and close all instruments."""
+        self._running = False
+        self._listener.close()
+        with self._lock:
+            for generator in self.sessions.values():
+                generator.close()
+            self.sessions.clear()
+
+    def get_session(self, serial=None):
+        """Get the generator with a serial number, opening it if needed.
+
+        Args:
+            serial (str): Serial number of the instrument. If not
+                          specified, the first connected device is used.
+
+        Returns:
+            SignalGenerator: The opened generator.
+        """
+        with self._open_lock:
+            with self._lock:
+                if serial is None:
+                    serial = self._default_serial
+                if serial in self.sessions:
+                    return self.sessions[serial]
+            return self.add_session(SignalGenerator(resource=serial))
+
+    def add_session(self, generator):
+        """Share an opened generator, e.g. one using a different transport.
+
+        Args:
+            generator (SignalGenerator): The generator to share.
+
+        Returns:
+            SignalGenerator: The generator registered for its serial number.
+        """
+        serial = generator.instrument_info.split(",")[2]
+        with self._lock:
+            if serial in self.sessions:
+                generator.close()
+                return self.sessions[serial]
+            generator.start_pipeline()
+            self.sessions[serial] = generator
+            if self._default_serial is None:
+                self._default_serial = serial
+            return generator
+
+    def _serve_client(self, connection):
+        # Shared memory of the last response, released once the client
+        # sends its next request as it has copied the data by then
+        blocks = []
+        with connection:
+            try:
+                while True:
+                    try:
+                        request = connection.recv()
+                    except (EOFError, OSError):
+                        return
+                    _release(blocks)
+                    try:
+                        response = ("ok", _share(self._handle(request),
+                                                 blocks, convert_lists=True))
+                    except Exception as error:
+                        response = ("error", error)
+                    connection.send(response)
+            finally:
+                _release(blocks)
+
+    def _handle(self, request):
+        action, serial, channel_number, name, args, kwargs = request
+        generator = self.get_session(serial)
+        pipeline = generator.pipeline
+        if action == "info":
+            return generator.connected_device
+        cls = SignalGenerator if channel_number is None else Channel
+        attribute = getattr(cls, str(name), None)
+        if action in ("get", "set") and not isinstance(attribute, property):
+            raise AttributeError("Unknown property {}".format(name))
+        if action == "get":
+            return pipeline.get(name, channel_number).result()
+        if action == "set":
+            return pipeline.set(name, args[0], channel_number).result()
+        if action == "call":
+            if name.startswith("_") or not callable(attribute):
+                raise AttributeError("Unknown method {}".format(name))
+            if channel_number is None:
+                target = generator
+            else:
+                target = generator.channels[int(channel_number) - 1]
+            args = [_attach(arg) for arg in args]
+            kwargs = {key: _attach(value) for key, value in kwargs.items()}
+            return pipeline.call(getattr(target, name), *args,
+                                 **kwargs).result()
+        raise ValueError("Unknown action {}".format(action))
+
+
+class RemoteSignalGenerator:
+    """Client side proxy of a signal generator owned by an
+    :class:`InstrumentServer`.
+
+    Properties and methods are the ones of :class:`.SignalGenerator`.
+    Generators returned by the server are not supported.
+
+    Attributes:
+        channels (list): List of all channels.
+        connected_device (str): The specific tektronix device which is
+                                connected.
+    """
+    def __init__(self, address, serial=None, authkey=None):
+        """Connect to the server.
+
+        Args:
+            address: Path of a Unix socket or (host, port) tuple for TCP.
+            serial (str): Serial number of the instrument. If not
+                          specified, the first connected device is used.
+            authkey (bytes): Key to authenticate with.
+        """
+        object.__setattr__(self, "_connection",
+                           Client(address, authkey=authkey))
+        object.__setattr__(self, "_serial", serial)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "channels", [
+            RemoteChannel(self, "1"), RemoteChannel(self, "2")])
+        object.__setattr__(self, "connected_device",
+                           self._request("info", None, None))
+
+    def __getattr__(self, name):
+        return _remote_attribute(self, SignalGenerator, None, name)
+
+    def __setattr__(self, name, value):
+        _remote_set(self, SignalGenerator, None, name, value)
+
+    def close(self):
+        """Close the connection to the server, the instrument stays open."""
+        self._connection.close()
+
+    def _request(self, action, channel_number, name, *args, **kwargs):
+        blocks = []
+        args = [_share(arg, blocks) for arg in args]
+        kwargs = {key: _share(value, blocks)
+                  for key, value in kwargs.items()}
+        try:
+            with self._lock:
+                self._connection.send((action, self._serial, channel_number,
+                                       name, args, kwargs))
+                status, result = self._connection.recv()
+                result = _attach(result)
+        finally:
+            _release(blocks)
+        if status == "error":
+            raise result
+        return result
+
+
+class RemoteChannel:
+    """Client side proxy of a channel, see :class:`.Channel`.
+
+    Attributes:
+        generator: Reference of :class:`RemoteSignalGenerator`.
+        channel_number (str): Number of the channel.
+    """
+    def __init__(self, generator, channel_number):
+        object.__setattr__(self, "generator", generator)
+        object.__setattr__(self, "channel_number", channel_number)
+
+    def __getattr__(self, name):
+        return _remote_attribute(self.generator, Channel,
+                                 self.channel_number, name)
+
+    def __setattr__(self, name, value):
+        _remote_set(self.generator, Channel, self.channel_number, name,
+                    value)
+
+
+def _remote_attribute(generator, cls, channel_number, name):
+    """Read a remote property or get a function calling a remote method."""
+    attribute = getattr(cls, name, None)
+    if isinstance(attribute, property):
+        return generator._request("get", channel_number, name)
+    if callable(attribute) and not name.startswith("_"):
+        def call(*args, **kwargs):
+            return generator._request("call", channel_number, name, *args,
+                                      **kwargs)
+        call.__name__ = name
+        call.__doc__ = attribute.__doc__
+        return call
+    raise AttributeError(name)
+
+
+def _remote_set(generator, cls, channel_number, name, value):
+    """Set a remote property."""
+    if not isinstance(getattr(cls, name, None), property):
+        raise AttributeError("Only properties can be set remotely")
+    generator._request("set", channel_number, name, value)
+
+
+def _share(value, blocks, convert_lists=False):
+    """Move large arrays to shared memory.
+
+    Args:
+        value: Value to hand over.
+        blocks (list): Created shared memory blocks, extended in place.
+        convert_lists (bool): Also move large lists of numbers, e.g. the
+                              data read from an edit memory.
+    """
+    is_list = False
+    if convert_lists and isinstance(value, list) and \
+            len(value) * 8 >= SHARED_MEMORY_THRESHOLD:
+        array = np.asarray(value)
+        if array.dtype.kind in "iuf":
+            value, is_list = array, True
+    if not isinstance(value, np.ndarray) or \
+            value.nbytes < SHARED_MEMORY_THRESHOLD:
+        return value
+    block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+    blocks.append(block)
+    _created_blocks.add(block.name)
+    np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+    return SharedArray(block.name, value.shape, value.dtype.str, is_list)
+
+
+def _attach(value):
+    """Copy arrays out of shared memory."""
+    if not isinstance(value, SharedArray):
+        return value
+    if sys.version_info >= (3, 13):
+        block = shared_memory.SharedMemory(name=value.name, track=False)
+    else:
+        block = shared_memory.SharedMemory(name=value.name)
+        # Attaching registers the block with the resource tracker of this
+        # process, which would unlink it at exit although the sender owns
+        # it. Blocks created by this process stay registered for it.
+        if os.name == "posix" and value.name not in _created_blocks:
+            resource_tracker.unregister(block._name, "shared_memory")
+    try:
+        array = np.array(np.ndarray(value.shape, value.dtype,
+                                    buffer=block.buf))
+    finally:
+        block.close()
+    return array.tolist() if value.is_list else array
+
+
+def _release(blocks):
+    """Free shared memory blocks once they are no longer needed."""
+    for block in blocks:
+        block.close()
+        block.unlink()
+        _created_blocks.discard(block.name)
+    blocks.clear()
@@ -0,0 +1,135 @@
+"""Timed changes of generator and channel settings."""
+import collections
+import time
+
+from .commands import join_commands, record_setting
+
+# Time in seconds before a deadline from which on the scheduler busy-waits
+# instead of sleeping, as sleeping may overshoot by around a millisecond
+SPIN_TIME = 0.002
+
+TimelineEvent = collections.namedtuple(
+    "TimelineEvent", ["time", "name", "value", "channel_number", "commands"])
+
+
+class Timeline:
+    """Schedule of property changes sent at given times.
+
+    The commands of all events are formatted when they are added. While the
+    timeline runs, the commands are sent without pacing at their deadlines,
+    measured with :func:`time.perf_counter`, and the errors are only
+    checked after the last event. Events closer together than the merge
+    window are sent as one compound message at the time of the earliest
+    one. Other threads cannot communicate with the instrument while the
+    timeline runs.
+
+    Attributes:
+        generator: Reference of :class:`.SignalGenerator`.
+        merge_window (float): Maximum time in seconds between the first and
+                              the last event sent in one transfer.
+        events (list): The scheduled events in the order they were added.
+    """
+    def __init__(self, generator, merge_window=0.005):
+        """Initialize the timeline.
+
+        Args:
+            generator: Reference of the :class:`.SignalGenerator` object.
+            merge_window (float): Maximum time in seconds between the first
+                                  and the last event sent in one transfer.
+        """
+        self.generator = generator
+        self.merge_window = merge_window
+        self.events = []
+
+    def add(self, offset, name, value, channel_number=None):
+        """Schedule a property change.
+
+        Args:
+            offset (float): Time of the change in seconds after the start
+                            of the timeline.
+            name (str): Name of the property.
+            value: Value to set.
+            channel_number (str): Number of the channel owning the property.
+                                  If not specified, the property of the
+                                  generator is set.
+
+        Raises:
+            ValueError: If the offset is negative or the property is
+                        unknown.
+        """
+        if offset < 0:
+            raise ValueError("Events cannot be scheduled before the start")
+        if channel_number is None:
+            owner = type(self.generator)
+        else:
+            owner = type(self.generator.channels[0])
+        if not isinstance(getattr(owner, name, None), property):
+            raise ValueError("Unknown property {}".format(name))
+        commands = record_setting(self.generator, name, value,
+                                  channel_number)
+        self.events.append(TimelineEvent(offset, name, value, channel_number,
+                                         commands))
+
+    def clear(self):
+        """Remove all scheduled events."""
+        self.events = []
+
+    def transfers(self):
+        """Group the events into transfers.
+
+        Returns:
+            list: Tuples of the send time, the indices of the events in
+            :attr:`events` and the messages to write, ordered by time.
+        """
+        order = sorted(range(len(self.events)),
+                       key=lambda index: self.events[index].time)
+        groups = []
+        for index in order:
+            event_time = self.events[index].time
+            if groups and event_time - groups[-1][0] <= self.merge_window:
+                groups[-1][1].append(index)
+            else:
+                groups.append((event_time, [index]))
+        transfers = []
+        for send_time, indices in groups:
+            commands = []
+            for index in indices:
+                commands += self.events[index].commands
+            transfers.append((send_time, indices, join_commands(commands)))
+        return transfers
+
+    def run(self):
+        """Send the scheduled events at their deadlines.
+
+        Returns:
+            dict: The host timestamps in seconds after which the events were
+            sent ('timestamps', based on :func:`time.perf_counter`) and
+            their lateness compared to the schedule ('lateness'), both in
+            the order of :attr:`events`, the number of transfers
+            ('transfers') and the largest lateness ('max_lateness').
+            Merged events sent before their time have a negative lateness.
+        """
+        transfers = self.transfers()
+        timestamps = [None] * len(self.events)
+        lateness = [None] * len(self.events)
+        generator = self.generator
+        with generator._lock:
+            start = time.perf_counter()
+            for send_time, indices, messages in transfers:
+                deadline = start + send_time
+                delay = deadline - time.perf_counter() - SPIN_TIME
+                if delay > 0:
+                    time.sleep(delay)
+                while time.perf_counter() < deadline:
+                    pass
+                for message in messages:
+                    generator._instrument.write(message)
+                timestamp = time.perf_counter()
+                for index in indices:
+                    timestamps[index] = timestamp
+                    lateness[index] = timestamp - start - \
+                        self.events[index].time
+            generator.error_check()
+        return {"timestamps": timestamps, "lateness": lateness,
+                "transfers": len(transfers),
+                "max_lateness": max(lateness, default=0.)}
@@ -0,0 +1,470 @@
+"""Connections used to communicate with a signal generator.
+
+:class:`VisaTransport` is used by default. The other transports talk to
+the instrument directly and do not need pyvisa to be installed.
+"""
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+# ioctl request setting the timeout of the Linux usbtmc driver in ms
+USBTMC_IOCTL_SET_TIMEOUT = 0x40045B0A
+
+# ioctl request enabling the end of message flag of the Linux usbtmc driver
+USBTMC_IOCTL_EOM_ENABLE = 0x40015B0B
+
+
+def import_pyvisa():
+    """Import pyvisa on first use.
+
+    Returns:
+        module: The pyvisa module.
+    """
+    import pyvisa
+    return pyvisa
+
+
+def to_ieee_block(values, datatype="h", is_big_endian=True):
+    """Encode values as IEEE 488.2 definite length block.
+
+    Args:
+        values (list): Values to encode.
+        datatype (str): Format character of the values as used by
+                        :mod:`struct`.
+        is_big_endian (bool): Byte order of the values.
+
+    Returns:
+        bytes: The block including its header.
+    """
+    data = np.asarray(values).astype(
+        (">" if is_big_endian else "<") + datatype).tobytes()
+    length = str(len(data))
+    return "#{}{}".format(len(length), length).encode() + data
+
+
+def from_ieee_block(block, datatype="h", is_big_endian=True):
+    """Decode an IEEE 488.2 definite length block.
+
+    Args:
+        block (bytes): The block including its header.
+        datatype (str): Format character of the values as used by
+                        :mod:`struct`.
+        is_big_endian (bool): Byte order of the values.
+
+    Returns:
+        list: The decoded values.
+    """
+    start = block.index(b"#")
+    digits = int(block[start + 1:start + 2])
+    length = int(block[start + 2:start + 2 + digits])
+    data = block[start + 2 + digits:start + 2 + digits + length]
+    return np.frombuffer(
+        data, (">" if is_big_endian else "<") + datatype).tolist()
+
+
+class Transport:
+    """Base class of the connections to an instrument.
+
+    Subclasses have to implement :meth:`write_raw`, :meth:`_receive` and
+    :meth:`close`. Messages are terminated by a line feed.
+
+    Attributes:
+        timeout (float): Timeout of a single transfer in milliseconds.
+        chunk_size (int): Maximum number of bytes per transfer.
+    """
+    def __init__(self, timeout=2000, chunk_size=20 * 1024):
+        """Initialize the transport.
+
+        Args:
+            timeout (float): Timeout of a single transfer in milliseconds.
+            chunk_size (int): Maximum number of bytes per transfer.
+        """
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._buffer = b""
+        # Responses of timed out queries still to arrive
+        self._stale_responses = 0
+
+    def write(self, message):
+        """Write a message."""
+        self.write_raw(message.encode() + b"\n")
+
+    def read(self):
+        """Read a message.
+
+        Returns:
+            str: The message including the line termination.
+        """
+        return self.read_raw().decode()
+
+    def query(self, message):
+        """Write a message and read the response.
+
+        Returns:
+            str: The response including the line termination.
+        """
+        self.write(message)
+        return self.read()
+
+    def write_binary_values(self, message, values, datatype="h",
+                            is_big_endian=True):
+        """Write a message followed by a block of binary values."""
+        self.write_raw(message.encode() +
+                       to_ieee_block(values, datatype, is_big_endian) +
+                       b"\n")
+
+    def query_binary_values(self, message, datatype="h",
+                            is_big_endian=True):
+        """Write a message and read a block of binary values.
+
+        Returns:
+            list: The decoded values.
+        """
+        self.write(message)
+        return from_ieee_block(self.read_raw(), datatype, is_big_endian)
+
+    def write_raw(self, data):
+        """Write bytes to the instrument."""
+        raise NotImplementedError
+
+    def write_stream(self, chunks):
+        """Write one message given as byte chunks without joining them.
+
+        Args:
+            chunks (iterable): The chunks of the message, the last one has
+                               to include the line termination.
+        """
+        for chunk in chunks:
+            self.write_raw(chunk)
+
+    def read_raw(self):
+        """Read a message as bytes.
+
+        Definite length blocks are read completely, even if they contain
+        line feeds.
+
+        Responses of queries which timed out are discarded first.
+
+        Returns:
+            bytes: The message including the line termination.
+        """
+        while self._stale_responses:
+            self._read_message()
+            self._stale_responses -= 1
+        return self._read_message()
+
+    def _read_message(self):
+        """Read the next message from the buffer or the instrument."""
+        end = self._message_end()
+        while end is None:
+            self._buffer += self._receive(self.chunk_size)
+            end = self._message_end()
+        message = self._buffer[:end + 1]
+        self._buffer = self._buffer[end + 1:]
+        return message
+
+    def wait_for_completion(self, timeout, service_request=True):
+        """Block until all pending commands of the instrument are complete.
+
+        The default implementation blocks in an ``*OPC?`` query, so no
+        polling is involved. If the query times out, its late response is
+        discarded by the next read.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds.
+            service_request (bool): Allow waiting for a service request
+                                    instead, if supported.
+
+        Raises:
+            TimeoutError: If the commands are not complete in time.
+        """
+        previous_timeout = self.timeout
+        self.timeout = timeout * 1000
+        try:
+            self.query("*OPC?")
+        except TimeoutError:
+            self._stale_responses += 1
+            raise
+        finally:
+            self.timeout = previous_timeout
+
+    def close(self):
+        """Close the connection."""
+        raise NotImplementedError
+
+    def _receive(self, size):
+        """Receive up to size bytes, at least one."""
+        raise NotImplementedError
+
+    def _message_end(self):
+        """Index of the line feed terminating the first buffered message or
+        None, if the message is incomplete."""
+        start = 0
+        if self._buffer.startswith(b"#"):
+            if len(self._buffer) < 2:
+                return None
+            digits = int(self._buffer[1:2])
+            if len(self._buffer) < 2 + digits:
+                return None
+            start = 2 + digits + int(self._buffer[2:2 + digits])
+        end = self._buffer.find(b"\n", start)
+        return end if end >= 0 else None
+
+
+class VisaTransport(Transport):
+    """Connection through a VISA resource.
+
+    Attributes:
+        resource: The opened pyvisa resource.
+    """
+    def __init__(self, resource):
+        """Initialize the transport.
+
+        Args:
+            resource: An opened pyvisa resource.
+        """
+        self.resource = resource
+        self._service_request = None
+
+    @property
+    def supports_service_request(self):
+        """Whether service requests of the instrument can be awaited."""
+        if self._service_request is None:
+            vi = import_pyvisa()
+            try:
+                self.resource.enable_event(
+                    vi.constants.EventType.service_request,
+                    vi.constants.EventMechanism.queue)
+                self._service_request = True
+            except (vi.errors.VisaIOError, NotImplementedError,
+                    AttributeError):
+                self._service_request = False
+        return self._service_request
+
+    def wait_for_completion(self, timeout, service_request=True):
+        """Block until all pending commands of the instrument are complete.
+
+        Waits for the service request raised by the operation complete
+        event, if supported by the resource and allowed. Otherwise blocks in
+        an ``*OPC?`` query. If the query times out, a device clear discards
+        its late response.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds.
+            service_request (bool): Allow waiting for a service request.
+
+        Raises:
+            TimeoutError: If the commands are not complete in time.
+        """
+        vi = import_pyvisa()
+        if not service_request or not self.supports_service_request:
+            try:
+                return super().wait_for_completion(timeout)
+            except vi.errors.VisaIOError as error:
+                if error.error_code != vi.constants.StatusCode.error_timeout:
+                    raise
+                self.resource.clear()
+                raise TimeoutError("Pending commands not complete") \
+                    from error
+        deadline = time.monotonic() + timeout
+        self.resource.write("*OPC")
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError("Pending commands not complete")
+                self.resource.wait_on_event(
+                    vi.constants.EventType.service_request,
+                    int(remaining * 1000))
+            except vi.errors.VisaIOError as error:
+                raise TimeoutError("Pending commands not complete") \
+                    from error
+            # Serial poll to clear the request, other events may have
+            # caused it as well
+            self.resource.read_stb()
+            if int(self.resource.query("*ESR?")) & 1:
+                return
+
+    @property
+    def timeout(self):
+        return self.resource.timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self.resource.timeout = value
+
+    @property
+    def chunk_size(self):
+        return self.resource.chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, value):
+        self.resource.chunk_size = value
+
+    def write(self, message):
+        self.resource.write(message)
+
+    def read(self):
+        return self.resource.read()
+
+    def query(self, message):
+        return self.resource.query(message)
+
+    def write_binary_values(self, message, values, datatype="h",
+                            is_big_endian=True):
+        self.resource.write_binary_values(message, values, datatype=datatype,
+                                          is_big_endian=is_big_endian)
+
+    def query_binary_values(self, message, datatype="h",
+                            is_big_endian=True):
+        return self.resource.query_binary_values(
+            message, datatype=datatype, is_big_endian=is_big_endian)
+
+    def write_raw(self, data):
+        self.resource.write_raw(data)
+
+    def write_stream(self, chunks):
+        # Signal the end of the message only with the last chunk
+        send_end = self.resource.send_end
+        self.resource.send_end = False
+        try:
+            for chunk, is_last in _mark_last(chunks):
+                self.resource.send_end = send_end if is_last else False
+                self.resource.write_raw(chunk)
+        finally:
+            self.resource.send_end = send_end
+
+    def read_raw(self):
+        return self.resource.read_raw()
+
+    def close(self):
+        self.resource.close()
+
+
+class SocketTransport(Transport):
+    """Connection through a raw SCPI socket, e.g. to a LAN connected
+    AFG31000.
+
+    Attributes:
+        host (str): Host name or IP address of the instrument.
+        port (int): Port of the SCPI socket server.
+    """
+    def __init__(self, host, port=5025, timeout=2000, chunk_size=20 * 1024):
+        """Open the connection.
+
+        Args:
+            host (str): Host name or IP address of the instrument.
+            port (int): Port of the SCPI socket server, as configured on the
+                        instrument.
+            timeout (float): Timeout of a single transfer in milliseconds.
+            chunk_size (int): Maximum number of bytes per transfer.
+        """
+        self.host = host
+        self.port = port
+        self._socket = socket.create_connection((host, port), timeout / 1000)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().__init__(timeout, chunk_size)
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+        self._socket.settimeout(value / 1000)
+
+    def write_raw(self, data):
+        self._socket.sendall(data)
+
+    def close(self):
+        self._socket.close()
+
+    def _receive(self, size):
+        data = self._socket.recv(size)
+        if not data:
+            raise ConnectionError("Connection closed by the instrument")
+        return data
+
+
+class UsbtmcTransport(Transport):
+    """Connection through the Linux usbtmc kernel driver.
+
+    Attributes:
+        path (str): Path of the device file.
+    """
+    def __init__(self, path="/dev/usbtmc0", timeout=2000,
+                 chunk_size=20 * 1024):
+        """Open the connection.
+
+        Args:
+            path (str): Path of the device file.
+            timeout (float): Timeout of a single transfer in milliseconds.
+            chunk_size (int): Maximum number of bytes per transfer.
+        """
+        self.path = path
+        self._file = os.open(path, os.O_RDWR)
+        super().__init__(timeout, chunk_size)
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+        import fcntl
+        try:
+            fcntl.ioctl(self._file, USBTMC_IOCTL_SET_TIMEOUT,
+                        struct.pack("I", int(value)))
+        except OSError:
+            # Older kernels only support the default timeout
+            pass
+
+    def write_raw(self, data):
+        # The driver splits the data into transfers and marks the end of the
+        # message only after the last one
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._file, view):]
+
+    def write_stream(self, chunks):
+        import fcntl
+        try:
+            fcntl.ioctl(self._file, USBTMC_IOCTL_EOM_ENABLE, b"\x00")
+        except OSError:
+            # Without control of the end of message flag, the message has
+            # to be written at once
+            return self.write_raw(b"".join(chunks))
+        try:
+            for chunk, is_last in _mark_last(chunks):
+                if is_last:
+                    fcntl.ioctl(self._file, USBTMC_IOCTL_EOM_ENABLE, b"\x01")
+                self.write_raw(chunk)
+        finally:
+            fcntl.ioctl(self._file, USBTMC_IOCTL_EOM_ENABLE, b"\x01")
+
+    def close(self):
+        os.close(self._file)
+
+    def _receive(self, size):
+        data = os.read(self._file, size)
+        if not data:
+            raise ConnectionError("No data received from the instrument")
+        return data
+
+
+def _mark_last(items):
+    """Iterate over items together with a flag marking the last one."""
+    iterator = iter(items)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
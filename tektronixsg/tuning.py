@@ -0,0 +1,206 @@
+"""Chunk sizes and timeouts of binary transfers adapted to the link.
+
+The settings are derived from the throughput of the link, which is updated
+with every large transfer. :func:`calibrate` benchmarks the link once, the
+results are stored per instrument serial number and loaded again on the
+next connection.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .waveforms import MAX_DATA_VALUE, MAX_WAVEFORM_LENGTH
+
+# Smallest timeout of a transfer in milliseconds
+MIN_TIMEOUT = 2000
+
+# Factor applied to the expected transfer time for the timeout
+TIMEOUT_SAFETY = 3
+
+# Transfers smaller than this number of bytes do not update the throughput
+MIN_MEASURED_SIZE = 4096
+
+# Weight of a new measurement in the moving average of the throughput
+THROUGHPUT_WEIGHT = 0.2
+
+# Chunk sizes in bytes tried during the calibration
+CALIBRATION_CHUNK_SIZES = (4096, 16384, 65536, 262144)
+
+
+class TransferSettings:
+    """Parameters of the binary transfers to one instrument.
+
+    Attributes:
+        chunk_size (int): Largest chunk size in bytes.
+        throughput (float): Throughput of the link in bytes per second.
+        latency (float): Time of a transfer without payload in seconds.
+    """
+    def __init__(self, chunk_size=20 * 1024, throughput=2e5, latency=0.01):
+        """Initialize the settings.
+
+        Args:
+            chunk_size (int): Largest chunk size in bytes.
+            throughput (float): Throughput of the link in bytes per second.
+            latency (float): Time of a transfer without payload in seconds.
+        """
+        self.chunk_size = chunk_size
+        self.throughput = throughput
+        self.latency = latency
+
+    def chunk_size_for(self, size):
+        """Chunk size of a transfer.
+
+        Args:
+            size (int): Payload of the transfer in bytes.
+
+        Returns:
+            int: Chunk size in bytes, the payload is transferred in one
+            chunk if it is smaller than the largest chunk size.
+        """
+        return int(min(self.chunk_size, max(size + 64, 1024)))
+
+    def timeout_for(self, size):
+        """Timeout of a transfer.
+
+        Args:
+            size (int): Payload of the transfer in bytes.
+
+        Returns:
+            float: Timeout in milliseconds.
+        """
+        expected = self.latency + size / self.throughput
+        return max(MIN_TIMEOUT, 1000 * TIMEOUT_SAFETY * expected)
+
+    def record(self, size, duration):
+        """Update the throughput with a measured transfer.
+
+        Args:
+            size (int): Payload of the transfer in bytes.
+            duration (float): Duration of the transfer in seconds.
+        """
+        if size < MIN_MEASURED_SIZE or duration <= self.latency:
+            return
+        throughput = size / (duration - self.latency)
+        self.throughput += THROUGHPUT_WEIGHT * (throughput - self.throughput)
+
+    def to_dict(self):
+        """Settings as dictionary."""
+        return {"chunk_size": self.chunk_size,
+                "throughput": self.throughput, "latency": self.latency}
+
+
+def settings_path():
+    """Path of the file storing the settings of all instruments."""
+    if os.name == "nt":
+        config_dir = os.environ.get("APPDATA", os.path.expanduser("~"))
+    else:
+        config_dir = os.environ.get(
+            "XDG_CONFIG_HOME", os.path.join(os.path.expanduser("~"),
+                                            ".config"))
+    return os.path.join(config_dir, "tektronixsg", "transfer.json")
+
+
+def load_transfer_settings(serial, path=None):
+    """Load the stored settings of an instrument.
+
+    Args:
+        serial (str): Serial number of the instrument.
+        path (str): File storing the settings, defaults to
+                    :func:`settings_path`.
+
+    Returns:
+        TransferSettings: The stored settings or None.
+    """
+    path = settings_path() if path is None else path
+    try:
+        with open(path) as settings_file:
+            stored = json.load(settings_file)
+    except (OSError, ValueError):
+        return None
+    try:
+        return TransferSettings(**stored[serial])
+    except (KeyError, TypeError):
+        # Missing or malformed entry
+        return None
+
+
+def save_transfer_settings(serial, settings, path=None):
+    """Store the settings of an instrument.
+
+    Args:
+        serial (str): Serial number of the instrument.
+        settings (TransferSettings): The settings to store.
+        path (str): File storing the settings, defaults to
+                    :func:`settings_path`.
+    """
+    path = settings_path() if path is None else path
+    try:
+        with open(path) as settings_file:
+            stored = json.load(settings_file)
+    except (OSError, ValueError):
+        stored = {}
+    stored[serial] = settings.to_dict()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as settings_file:
+        json.dump(stored, settings_file, indent=2)
+
+
+def calibrate(generator, chunk_sizes=CALIBRATION_CHUNK_SIZES, repeat=2):
+    """Benchmark the link to an instrument.
+
+    Writes and reads back a waveform of the maximum length with every chunk
+    size. The transfers are timed directly on the transport while other
+    threads are locked out, so neither the pacing of the commands nor the
+    error checks are included. The errors are checked once at the end. The
+    content of the edit memory of the first channel is restored afterwards.
+
+    The chunk size of a :class:`.VisaTransport` only applies to reads, so
+    with VISA only the read side is tuned.
+
+    Args:
+        generator: Reference of the :class:`.SignalGenerator` object.
+        chunk_sizes (tuple): Chunk sizes in bytes to try.
+        repeat (int): Number of transfers per chunk size.
+
+    Returns:
+        TransferSettings: The settings with the highest throughput.
+    """
+    instrument = generator._instrument
+    memory = "" if generator.connected_device == "AFG1022" else 1
+    length = MAX_WAVEFORM_LENGTH[generator.connected_device]
+    data = np.linspace(0, MAX_DATA_VALUE, length).astype(np.int16)
+    size = 2 * length
+    with generator._lock:
+        previous_data = generator.read_data_emom(memory=1)
+        previous = instrument.chunk_size, instrument.timeout
+        try:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                instrument.query("*OPC?")
+            latency = (time.perf_counter() - start) / repeat
+            best = None
+            for chunk_size in chunk_sizes:
+                # Pessimistic throughput for long timeouts during the
+                # benchmark
+                instrument.chunk_size = chunk_size
+                instrument.timeout = TransferSettings(
+                    chunk_size, 1e4, latency).timeout_for(size)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    instrument.write_binary_values(
+                        "DATA:DATA EMEM{},".format(memory), data,
+                        datatype="h", is_big_endian=True)
+                    instrument.query_binary_values(
+                        "DATA:DATA? EMEM{}".format(memory),
+                        datatype="h", is_big_endian=True)
+                duration = (time.perf_counter() - start) / (2 * repeat)
+                throughput = size / max(duration - latency, 1e-6)
+                if best is None or throughput > best.throughput:
+                    best = TransferSettings(chunk_size, throughput, latency)
+        finally:
+            instrument.chunk_size, instrument.timeout = previous
+            generator.write_data_emom(previous_data, memory=1)
+        generator.error_check()
+    return best
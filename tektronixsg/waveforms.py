@@ -0,0 +1,547 @@
+"""Synthesis and encoding of arbitrary waveforms.
+
+The functions generating waveforms return one period of the signal as
+voltage vector with the given number of samples. They are fully vectorized
+and can be passed to :meth:`.Channel.set_arbitrary_signal` directly or be
+built through a :class:`WaveformBuilder`, which keeps the encoded data in a
+cache.
+"""
+from collections import OrderedDict, namedtuple
+import os
+import struct
+import threading
+
+import numpy as np
+
+# Maximum value of the waveform data, corresponds to the maximum voltage
+MAX_DATA_VALUE = 16383
+
+# Arbitrary waveform length of the edit memories
+MAX_WAVEFORM_LENGTH = {"AFG1022": 8192, "AFG31052": 131072}
+
+EncodedWaveform = namedtuple(
+    "EncodedWaveform", ["data", "voltage_amplitude", "voltage_offset"])
+EncodedWaveform.__doc__ = """Waveform ready to be written to an edit memory.
+
+Attributes:
+    data (numpy.ndarray): Values ranging from 0 to 16383 as int16.
+    voltage_amplitude (float): Amplitude (range) of the signal in Volt.
+    voltage_offset (float): Voltage offset in Volt.
+"""
+
+
+def encode_waveform(voltage_vector):
+    """Convert a voltage vector to edit memory data.
+
+    Args:
+        voltage_vector (numpy.ndarray): Voltage vector as numpy array.
+
+    Returns:
+        EncodedWaveform: The data, amplitude and offset of the signal.
+    """
+    voltage_vector = np.asarray(voltage_vector, dtype=float)
+    min_voltage = voltage_vector.min()
+    max_voltage = voltage_vector.max()
+    voltage_range = abs(max_voltage - min_voltage)
+    voltage_offset = (min_voltage + max_voltage) / 2
+    if voltage_range == 0:
+        data = np.zeros(len(voltage_vector), dtype=np.int16)
+    else:
+        normed_voltage = np.abs(voltage_vector - min_voltage) / voltage_range
+        data = (MAX_DATA_VALUE * normed_voltage).astype(np.int16)
+    return EncodedWaveform(data, float(voltage_range), float(voltage_offset))
+
+
+def open_waveform_file(path, sample_format=None, channel=0):
+    """Memory-map the samples of a waveform file.
+
+    Supported are NumPy .npy files, WAV files with 8, 16, 24 or 32 bit
+    integer or 32 or 64 bit floating point samples and raw files containing
+    nothing but samples. The samples are not read until they are accessed.
+
+    Args:
+        path (str): Path of the file.
+        sample_format (str): NumPy data type of the samples of raw files,
+                             e.g. "<i2" or "float32". Defaults to little
+                             endian int16. Ignored for .npy and WAV files.
+        channel (int): Channel of multi channel WAV files or column of two
+                       dimensional .npy files.
+
+    Returns:
+        tuple: The samples as one dimensional array, the scale and the zero
+        value converting them to Volt, voltage = (sample - zero) * scale.
+        Integer WAV samples are scaled to a full scale of 1 V, all other
+        samples are taken as Volt. 24 bit samples are returned as a
+        sequence which is converted to an array when sliced.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        samples = np.load(path, mmap_mode="r")
+        if samples.ndim == 2:
+            samples = samples[:, channel]
+        return samples, 1., 0.
+    if extension == ".wav":
+        return _open_wav(path, channel)
+    dtype = np.dtype(sample_format if sample_format is not None else "<i2")
+    return np.memmap(path, dtype=dtype, mode="r"), 1., 0.
+
+
+def _open_wav(path, channel):
+    """Memory-map the samples of a WAV file."""
+    with open(path, "rb") as wav_file:
+        riff, _, wave = struct.unpack("<4sI4s", wav_file.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError("{} is not a WAV file".format(path))
+        sample_type = None
+        while True:
+            header = wav_file.read(8)
+            if len(header) < 8:
+                raise ValueError("{} contains no samples".format(path))
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                chunk = wav_file.read(chunk_size)
+                format_tag, channels, _, _, block_align, _ = \
+                    struct.unpack("<HHIIHH", chunk[:16])
+                # Extensible format stores the actual tag in the sub format
+                if format_tag == 0xFFFE:
+                    format_tag = struct.unpack("<H", chunk[24:26])[0]
+                # Samples are left-justified in their container, so the
+                # container size determines the full scale
+                size = block_align // channels
+                sample_type = "f" if format_tag == 3 else \
+                    ("u" if size == 1 else "i")
+            elif chunk_id == b"data":
+                data_offset = wav_file.tell()
+                break
+            else:
+                wav_file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+    if sample_type is None:
+        raise ValueError("{} has no format chunk".format(path))
+    if sample_type + str(size) not in ("u1", "i2", "i3", "i4", "f4", "f8"):
+        raise ValueError("{} byte {} samples are not supported".format(
+            size, "floating point" if sample_type == "f" else "integer"))
+    frames = chunk_size // (size * channels)
+    bits = 8 * size
+    if size == 3:
+        data = np.memmap(path, dtype="u1", mode="r", offset=data_offset,
+                         shape=(frames, channels, 3))
+        return _Int24Samples(data, channel), 2. ** (1 - bits), 0.
+    dtype = np.dtype("<{}{}".format(sample_type, size))
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                        shape=(frames, channels))[:, channel]
+    if sample_type == "f":
+        return samples, 1., 0.
+    if sample_type == "u":
+        return samples, 2. ** (1 - bits), 2. ** (bits - 1)
+    return samples, 2. ** (1 - bits), 0.
+
+
+class _Int24Samples:
+    """Memory-mapped 24 bit samples, converted to int32 when sliced."""
+    def __init__(self, data, channel):
+        self._data = data
+        self._channel = channel
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        packed = self._data[index, self._channel].astype(np.int32)
+        values = packed[..., 0] | (packed[..., 1] << 8) | \
+            (packed[..., 2] << 16)
+        # Sign extension
+        return (values ^ 0x800000) - 0x800000
+
+
+def encode_stream(samples, scale=1., zero=0., chunk_size=65536):
+    """Encode samples chunk by chunk.
+
+    Equivalent to :func:`encode_waveform`, but only a chunk of the samples
+    is converted at a time, so the memory usage does not depend on the
+    number of samples.
+
+    Args:
+        samples (numpy.ndarray): Samples, e.g. a memory-mapped file.
+        scale (float): Scale converting the samples to Volt.
+        zero (float): Sample value corresponding to 0 V.
+        chunk_size (int): Number of samples per chunk.
+
+    Returns:
+        tuple: The amplitude (range) and the offset of the signal in Volt
+        and an iterator over the data as big endian int16 bytes.
+    """
+    starts = range(0, len(samples), chunk_size)
+    minimum = min(samples[start:start + chunk_size].min()
+                  for start in starts)
+    maximum = max(samples[start:start + chunk_size].max()
+                  for start in starts)
+    sample_range = float(maximum) - float(minimum)
+
+    def chunks():
+        for start in starts:
+            chunk = samples[start:start + chunk_size].astype(float)
+            if sample_range == 0:
+                data = np.zeros(len(chunk))
+            else:
+                data = MAX_DATA_VALUE * (chunk - float(minimum)) / \
+                    sample_range
+            yield data.astype(">i2").tobytes()
+
+    min_voltage = (float(minimum) - zero) * scale
+    max_voltage = (float(maximum) - zero) * scale
+    return abs(max_voltage - min_voltage), (min_voltage + max_voltage) / 2, \
+        chunks()
+
+
+def reduce_waveform(voltage_vector, tolerance=1e-3):
+    """Find the shortest waveform generating the same signal.
+
+    Detects repetitions of a fundamental period with the autocorrelation
+    of the signal. The repetitions can be replaced by a single period
+    played with a correspondingly higher frequency. The period is then
+    decimated by the largest factor for which every block of that many
+    samples is constant, e.g. if each value is held for several samples.
+    The edit memory is played at a single sample rate, so only blocks of
+    equal length dividing the period can be merged, not constant runs of
+    arbitrary length.
+
+    The reconstruction error of both steps together stays within the
+    tolerance.
+
+    Args:
+        voltage_vector (numpy.ndarray): Voltage vector as numpy array.
+        tolerance (float): Maximum deviation of the reconstructed signal
+                           relative to its peak-to-peak voltage.
+
+    Returns:
+        tuple: The reduced voltage vector, the number of repetitions of it
+        within the original vector, the number of samples each sample of it
+        stands for and the maximum absolute reconstruction error in Volt.
+    """
+    voltage_vector = np.asarray(voltage_vector, dtype=float)
+    length = len(voltage_vector)
+    limit = tolerance * np.ptp(voltage_vector)
+    repetitions = 1
+    reduced = voltage_vector
+    if limit > 0:
+        centered = voltage_vector - voltage_vector.mean()
+        spectrum = np.fft.rfft(centered)
+        correlation = np.fft.irfft(np.abs(spectrum) ** 2, length)
+        correlation /= correlation[0]
+        # Lowest correlation of a signal repeating within the limit
+        threshold = 1 - 2 * limit * np.abs(centered).mean() / \
+            np.mean(centered ** 2)
+        # Only whole repetitions are seamless, so the period has to divide
+        # the length. Check the candidates with high correlation, shortest
+        # first.
+        periods = _divisors(length)
+        periods = periods[(periods >= 2) & (periods < length)]
+        candidates = periods[correlation[periods] >= threshold]
+        for period in candidates:
+            periods_matrix = voltage_vector.reshape(-1, period)
+            mean_period = periods_matrix.mean(axis=0)
+            if np.abs(periods_matrix - mean_period).max() <= limit:
+                repetitions = int(length // period)
+                reduced = mean_period
+                break
+    decimation = 1
+    for step in _divisors(len(reduced))[::-1]:
+        if len(reduced) // step < 2 or step == 1:
+            continue
+        runs = reduced.reshape(-1, step)
+        if np.ptp(runs, axis=1).max() > limit:
+            continue
+        # The error of the period averaging adds up, check the total error
+        decimated = runs.mean(axis=1)
+        if np.abs(voltage_vector.reshape(-1, len(decimated), step) -
+                  decimated[:, np.newaxis]).max() <= limit:
+            decimation = int(step)
+            reduced = decimated
+            break
+    reconstructed = np.tile(np.repeat(reduced, decimation), repetitions)
+    error = float(np.abs(reconstructed - voltage_vector).max())
+    return reduced, repetitions, decimation, error
+
+
+def _divisors(number):
+    """All divisors of a number in ascending order."""
+    candidates = np.arange(1, int(np.sqrt(number)) + 1)
+    divisors = candidates[number % candidates == 0]
+    return np.unique(np.concatenate((divisors, number // divisors)))
+
+
+def sine(length, cycles=1, amplitude=1., offset=0., phase=0.):
+    """Sine wave.
+
+    Args:
+        length (int): Number of samples.
+        cycles (float): Number of periods within the samples.
+        amplitude (float): Peak voltage in Volt.
+        offset (float): Voltage offset in Volt.
+        phase (float): Phase in radiant.
+    """
+    time_base = np.arange(length) / length
+    return amplitude * np.sin(2 * np.pi * cycles * time_base + phase) + \
+        offset
+
+
+def square(length, cycles=1, amplitude=1., offset=0., duty=0.5):
+    """Square wave.
+
+    Args:
+        length (int): Number of samples.
+        cycles (float): Number of periods within the samples.
+        amplitude (float): Peak voltage in Volt.
+        offset (float): Voltage offset in Volt.
+        duty (float): Fraction of the period with high level.
+    """
+    position = np.modf(np.arange(length) * cycles / length)[0]
+    return np.where(position < duty, amplitude, -amplitude) + offset
+
+
+def ramp(length, cycles=1, amplitude=1., offset=0., symmetry=1.):
+    """Ramp wave.
+
+    Args:
+        length (int): Number of samples.
+        cycles (float): Number of periods within the samples.
+        amplitude (float): Peak voltage in Volt.
+        offset (float): Voltage offset in Volt.
+        symmetry (float): Fraction of the period with rising slope.
+    """
+    position = np.modf(np.arange(length) * cycles / length)[0]
+    rising = position / symmetry if symmetry > 0 else np.zeros(length)
+    falling = (1 - position) / (1 - symmetry) if symmetry < 1 else \
+        np.zeros(length)
+    level = np.where(position < symmetry, rising, falling)
+    return amplitude * (2 * level - 1) + offset
+
+
+def chirp(length, start_cycles, stop_cycles, amplitude=1., offset=0.,
+          method="linear"):
+    """Sine sweep.
+
+    The frequencies are given as cycles per memory period, i.e. relative to
+    the frequency of the channel.
+
+    Args:
+        length (int): Number of samples.
+        start_cycles (float): Start frequency.
+        stop_cycles (float): Stop frequency.
+        amplitude (float): Peak voltage in Volt.
+        offset (float): Voltage offset in Volt.
+        method (str): Sweep shape, either "linear" or "exponential".
+    """
+    time_base = np.arange(length) / length
+    if method == "linear":
+        phase = start_cycles * time_base + \
+            (stop_cycles - start_cycles) * time_base ** 2 / 2
+    elif method == "exponential":
+        ratio = stop_cycles / start_cycles
+        phase = start_cycles * (ratio ** time_base - 1) / np.log(ratio)
+    else:
+        raise ValueError("Unknown chirp method {}".format(method))
+    return amplitude * np.sin(2 * np.pi * phase) + offset
+
+
+def multitone(length, cycles, amplitudes=None, phases=None, offset=0.):
+    """Sum of sine waves.
+
+    Args:
+        length (int): Number of samples.
+        cycles (list): Number of periods of each tone within the samples.
+        amplitudes (list): Peak voltage of each tone in Volt. Defaults
+                           to 1 V.
+        phases (list): Phase of each tone in radiant. Defaults to 0.
+        offset (float): Voltage offset in Volt.
+    """
+    cycles = np.asarray(cycles, dtype=float)
+    amplitudes = np.ones(len(cycles)) if amplitudes is None else \
+        np.asarray(amplitudes, dtype=float)
+    phases = np.zeros(len(cycles)) if phases is None else \
+        np.asarray(phases, dtype=float)
+    time_base = np.arange(length) / length
+    tones = np.sin(2 * np.pi * np.outer(cycles, time_base) + phases[:, None])
+    return amplitudes @ tones + offset
+
+
+def pulse_train(length, pulses=1, duty=0.5, low=0., high=1., rise=0.,
+                fall=0.):
+    """Train of trapezoidal pulses.
+
+    Args:
+        length (int): Number of samples.
+        pulses (int): Number of pulses within the samples.
+        duty (float): Fraction of the pulse period between the 50 % points
+                      of the edges.
+        low (float): Low level in Volt.
+        high (float): High level in Volt.
+        rise (float): Fraction of the pulse period for the rising edge.
+        fall (float): Fraction of the pulse period for the falling edge.
+    """
+    position = np.modf(np.arange(length) * pulses / length)[0]
+    rise_start = -rise / 2
+    fall_start = duty - fall / 2
+    # Position relative to the start of the rising edge, wrapped so the
+    # rising edge may start before the period
+    position = np.where(position >= 1 + rise_start, position - 1, position)
+    rising = np.clip((position - rise_start) / rise, 0, 1) if rise > 0 \
+        else (position >= 0).astype(float)
+    falling = np.clip((position - fall_start) / fall, 0, 1) if fall > 0 \
+        else (position >= duty).astype(float)
+    level = np.minimum(rising, 1 - falling)
+    return low + (high - low) * level
+
+
+def noise_burst(length, start=0., stop=1., amplitude=1., offset=0.,
+                seed=None):
+    """Gaussian noise within a window, constant offset elsewhere.
+
+    Args:
+        length (int): Number of samples.
+        start (float): Start of the burst as fraction of the period.
+        stop (float): End of the burst as fraction of the period.
+        amplitude (float): Standard deviation of the noise in Volt.
+        offset (float): Voltage offset in Volt.
+        seed (int): Seed of the random number generator. The waveform is
+                    only cached, if a seed is given.
+    """
+    position = np.arange(length) / length
+    noise = np.random.default_rng(seed).normal(0, amplitude, length)
+    return np.where((position >= start) & (position < stop), noise, 0.) + \
+        offset
+
+
+WAVEFORMS = {"sine": sine, "square": square, "ramp": ramp, "chirp": chirp,
+             "multitone": multitone, "pulse_train": pulse_train,
+             "noise_burst": noise_burst}
+
+
+class WaveformCache:
+    """Least recently used cache of encoded waveforms limited by size.
+
+    Attributes:
+        max_bytes (int): Maximum size of the cached data in bytes.
+        size (int): Current size of the cached data in bytes.
+    """
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        """Initialize the cache.
+
+        Args:
+            max_bytes (int): Maximum size of the cached data in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        """Get a cached waveform.
+
+        Returns:
+            EncodedWaveform: The waveform or None if it is not cached.
+        """
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, waveform):
+        """Add a waveform, dropping the least recently used ones if needed.
+
+        Waveforms larger than the whole cache are not stored.
+        """
+        size = waveform.data.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key).data.nbytes
+            while self.size + size > self.max_bytes:
+                self.size -= self._items.popitem(last=False)[1].data.nbytes
+            self._items[key] = waveform
+            self.size += size
+
+    def clear(self):
+        """Remove all waveforms."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+class WaveformBuilder:
+    """Build encoded waveforms for a signal generator and cache them.
+
+    Repeatedly building the same waveform neither generates nor encodes it
+    again.
+
+    Attributes:
+        length (int): Number of samples of the waveforms.
+        cache (WaveformCache): Cache of the encoded waveforms.
+    """
+    def __init__(self, generator=None, length=None, cache_size=64 * 2 ** 20):
+        """Initialize the builder.
+
+        Args:
+            generator: Reference of the :class:`.SignalGenerator` object.
+                       Used to determine the memory length of the connected
+                       model.
+            length (int): Number of samples of the waveforms. If not
+                          specified, the memory length of the connected
+                          model is used.
+            cache_size (int): Maximum size of the cache in bytes.
+        """
+        if length is None:
+            if generator is None:
+                raise ValueError("Either a generator or a length is required")
+            length = MAX_WAVEFORM_LENGTH[generator.connected_device]
+        self.length = length
+        self.cache = WaveformCache(cache_size)
+
+    def build(self, name, **parameters):
+        """Build an encoded waveform.
+
+        Args:
+            name (str): Name of the waveform, see WAVEFORMS.
+            **parameters: Parameters of the waveform function.
+
+        Returns:
+            EncodedWaveform: The encoded waveform.
+        """
+        cacheable = name != "noise_burst" or \
+            parameters.get("seed") is not None
+        key = (name, self.length, _freeze(parameters))
+        waveform = self.cache.get(key) if cacheable else None
+        if waveform is None:
+            waveform = encode_waveform(
+                WAVEFORMS[name](self.length, **parameters))
+            if cacheable:
+                self.cache.put(key, waveform)
+        return waveform
+
+    def upload(self, channel, name, **parameters):
+        """Build a waveform and set it as signal of a channel.
+
+        Args:
+            channel: The :class:`.Channel` to output the waveform.
+            name (str): Name of the waveform, see WAVEFORMS.
+            **parameters: Parameters of the waveform function.
+        """
+        channel.set_encoded_signal(self.build(name, **parameters))
+
+
+def _freeze(parameters):
+    """Hashable representation of waveform parameters."""
+    frozen = []
+    for key, value in sorted(parameters.items()):
+        if isinstance(value, (list, tuple, np.ndarray)):
+            value = tuple(np.asarray(value).tolist())
+        frozen.append((key, value))
+    return tuple(frozen)
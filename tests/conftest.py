@@ -0,0 +1,97 @@
+"""Shared fixtures of the tests of `tektronixsg`."""
+import socket
+import threading
+import time
+
+import pytest
+
+
+class InstrumentStandIn:
+    """TCP server answering like a signal generator."""
+    def __init__(self):
+        self.settings = {}
+        self.memory = b""
+        self.messages = []
+        self.errors = []
+        self.complete = True
+        self.completion_delay = 0
+        self._server = socket.socket()
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.close()
+
+    def _serve(self):
+        connection, _ = self._server.accept()
+        buffer = b""
+        with connection:
+            while True:
+                message, buffer = self._split(buffer)
+                if message is None:
+                    data = connection.recv(4096)
+                    if not data:
+                        return
+                    buffer += data
+                    continue
+                response = self._handle(message)
+                if response is not None:
+                    connection.sendall(response + b"\n")
+
+    @staticmethod
+    def _split(buffer):
+        start = 0
+        block = buffer.find(b"#")
+        newline = buffer.find(b"\n")
+        if block >= 0 and (newline < 0 or block < newline):
+            if len(buffer) < block + 2:
+                return None, buffer
+            digits = int(buffer[block + 1:block + 2])
+            if len(buffer) < block + 2 + digits:
+                return None, buffer
+            start = block + 2 + digits + int(
+                buffer[block + 2:block + 2 + digits])
+        end = buffer.find(b"\n", start)
+        if end < 0:
+            return None, buffer
+        return buffer[:end], buffer[end + 1:]
+
+    def _handle(self, message):
+        self.messages.append(message)
+        if message.startswith(b"DATA:DATA EMEM"):
+            self.memory = message[message.index(b"#"):]
+            return None
+        if message.startswith(b"DATA:DATA? EMEM"):
+            return self.memory
+        responses = []
+        for command in message.decode().split(";"):
+            command = command.lstrip(":")
+            if command == "*IDN?":
+                responses.append("TEKTRONIX,AFG31052,C000001,FV:1.0")
+            elif command == "*OPC?":
+                time.sleep(self.completion_delay)
+                if self.complete:
+                    responses.append("1")
+            elif command == "SYSTem:ERRor?":
+                responses.append(self.errors.pop(0) if self.errors
+                                 else '0,"No error"')
+            elif command == "*STB?":
+                responses.append("4" if self.errors else "0")
+            elif command.startswith("BAD"):
+                self.errors.append('-113,"Undefined header"')
+            elif command.endswith("?"):
+                responses.append(self.settings.get(command[:-1], "0"))
+            elif " " in command:
+                header, value = command.split(" ", 1)
+                self.settings[header] = value
+        return ";".join(responses).encode() if responses else None
+
+
+@pytest.fixture
+def stand_in():
+    server = InstrumentStandIn()
+    yield server
+    server.close()
@@ -0,0 +1,62 @@
+"""Tests for the command line interface of `tektronixsg`."""
+import json
+
+import pytest
+
+from tektronixsg import cli
+
+
+def test_dry_run(tmp_path, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pulse.wav").write_bytes(b"")
+    configuration = tmp_path / "setup.json"
+    configuration.write_text(json.dumps({"devices": [
+        {"serial": "C000001", "model": "AFG31052",
+         "trigger_source": "external",
+         "channels": {"1": {"frequency": 1000, "output_on": True},
+                      "2": {"waveform": "pulse.wav"}}}]}))
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["apply", str(configuration), "--dry-run"])
+    assert exit_info.value.code == 0
+    assert capsys.readouterr().out.splitlines() == [
+        "# AFG31052 C000001",
+        "# upload pulse.wav to channel 2",
+        ":TRIG:SOUR EXT;:SOUR1:FREQ 1000;:OUTP1 1"]
+
+
+def test_unknown_property(tmp_path, capsys):
+    configuration = tmp_path / "setup.json"
+    configuration.write_text(json.dumps(
+        {"model": "AFG1022", "channels": {"1": {"amplitude": 1}}}))
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["apply", str(configuration), "--dry-run"])
+    assert exit_info.value.code == 2
+    output = capsys.readouterr()
+    assert output.out == ""
+    assert "Unknown channel property amplitude" in output.err
+
+
+def test_missing_configuration(tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["apply", str(tmp_path / "missing.json"), "--dry-run"])
+    assert exit_info.value.code == 2
+
+
+@pytest.mark.parametrize("content", [
+    [1, 2],
+    {"channels": {"1": {"signal_type": "sinus"}}},
+    {"channels": {"3": {"frequency": 1000}}},
+    {"channels": {"1": {"waveform": {"path": "a.wav", "gain": 2}}}},
+    {"channels": {"1": {"waveform": "missing.wav"}}},
+    {"model": "AFG1022", "channels": {"1": {"voltage_max": 1}}}])
+def test_invalid_configuration(tmp_path, monkeypatch, content):
+    def discover():
+        raise AssertionError("Connected before the validation")
+
+    monkeypatch.setattr(cli, "list_connected_tektronix_generators", discover)
+    monkeypatch.setattr(cli, "SignalGenerator", discover)
+    configuration = tmp_path / "setup.json"
+    configuration.write_text(json.dumps(content))
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(["apply", str(configuration)])
+    assert exit_info.value.code == 2
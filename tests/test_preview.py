@@ -0,0 +1,70 @@
+"""Tests for the output model of `tektronixsg`."""
+import numpy as np
+import pytest
+
+from tektronixsg import SignalGenerator, SocketTransport
+from tektronixsg.preview import read_configuration, render
+
+SINE = {"output_on": True, "signal_type": "sine", "frequency": 1000.,
+        "phase": 0., "voltage_amplitude": 2., "voltage_offset": 0.5,
+        "modulation": None}
+
+
+def test_sine():
+    times = np.linspace(0, 2e-3, 100)
+    assert np.allclose(render(SINE, times),
+                       0.5 + np.sin(2 * np.pi * 1000 * times))
+    assert np.all(render(dict(SINE, output_on=False), times) == 0)
+
+
+def test_pulse_transitions():
+    configuration = dict(SINE, signal_type="pulse", pulse_duty=25.,
+                         pulse_leading_transition=1e-4,
+                         pulse_trailing_transition=1e-4)
+    output = render(configuration, [-1e-4, 0, 1e-4, 2.5e-4, 3e-4, 5e-4])
+    assert np.allclose(output, [-0.5, 0.5, 1.5, 0.5, -0.5, -0.5])
+
+
+def test_memory():
+    configuration = dict(SINE, signal_type="memory1",
+                         memory=[0, 16383, 16383, 0])
+    output = render(configuration, np.arange(8) * 2.5e-4)
+    assert np.allclose(output, [-0.5, 1.5, 1.5, -0.5] * 2)
+
+
+def test_triggered_burst():
+    configuration = dict(SINE, burst_on=True, burst_mode="triggered",
+                         burst_cycles=2, burst_delay=1e-3)
+    times = np.linspace(0, 10e-3, 1001)
+    output = render(configuration, times, triggers=[0., 5e-3])
+    active = ((times >= 1e-3) & (times < 3e-3)) | \
+        ((times >= 6e-3) & (times < 8e-3))
+    assert np.allclose(output[~active], 0.5)
+    assert np.allclose(output[active],
+                       0.5 + np.sin(2 * np.pi * 1000 * times[active]))
+
+
+def test_unsupported():
+    with pytest.raises(NotImplementedError):
+        render(dict(SINE, signal_type="noise"), [0.])
+    with pytest.raises(NotImplementedError):
+        render(dict(SINE, modulation="am"), [0.])
+
+
+def test_read_configuration(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    stand_in.settings["SOUR1:FUNC"] = "SIN"
+    stand_in.settings["SOUR1:FM:STAT"] = "1"
+    start = len(stand_in.messages)
+    configuration = read_configuration(device.channels[0])
+    assert configuration["signal_type"] == "sine"
+    assert configuration["modulation"] == "fm"
+    # All properties are read with one message
+    queries = [message for message in stand_in.messages[start:]
+               if message not in (b"*STB?", b"*OPC?")]
+    assert len(queries) == 1
+    stand_in.settings["SOUR1:FUNC"] = "EFIL"
+    with pytest.raises(NotImplementedError):
+        read_configuration(device.channels[0])
+    device.close()
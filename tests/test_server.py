@@ -0,0 +1,111 @@
+"""Tests for the instrument server of `tektronixsg` using a local stand-in.
+"""
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from tektronixsg import SignalGenerator, SocketTransport
+from tektronixsg.server import InstrumentServer, RemoteSignalGenerator
+
+
+@pytest.fixture
+def server(tmp_path, stand_in):
+    instrument_server = InstrumentServer(str(tmp_path / "server.sock"))
+    instrument_server.add_session(SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port)))
+    threading.Thread(target=instrument_server.serve_forever,
+                     daemon=True).start()
+    yield instrument_server
+    instrument_server.close()
+
+
+def test_remote_properties(server):
+    device = RemoteSignalGenerator(server.address)
+    assert device.connected_device == "AFG31052"
+    device.channels[0].frequency = 1000
+    assert device.channels[0].frequency == 1000
+    device.close()
+
+
+def test_multiple_clients(server):
+    devices = [RemoteSignalGenerator(server.address, serial="C000001")
+               for _ in range(3)]
+
+    def set_frequency(device, frequency):
+        for _ in range(5):
+            device.channels[1].frequency = frequency
+
+    threads = [threading.Thread(target=set_frequency, args=(device, 100))
+               for device in devices]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert devices[0].channels[1].frequency == 100
+    for device in devices:
+        device.close()
+
+
+def test_remote_arbitrary_signal(server):
+    device = RemoteSignalGenerator(server.address)
+    voltage_vector = np.linspace(-1, 1, 50000)
+    device.channels[0].set_arbitrary_signal(voltage_vector)
+    assert device.channels[0].voltage_amplitude == 2
+    data = device.read_data_emom(memory=1)
+    assert isinstance(data, list) and len(data) == 50000
+    device.close()
+
+
+def test_tcp_requires_authkey():
+    with pytest.raises(ValueError):
+        InstrumentServer(("127.0.0.1", 0))
+
+
+def test_private_methods_rejected(server):
+    device = RemoteSignalGenerator(server.address)
+    with pytest.raises(AttributeError):
+        device._request("call", None, "_write_message", "*RST")
+    with pytest.raises(AttributeError):
+        device._request("set", "1", "generator", None)
+    device.close()
+
+
+def test_concurrent_sessions(tmp_path, monkeypatch, stand_in):
+    opened = []
+
+    def open_generator(resource=None):
+        opened.append(resource)
+        return SignalGenerator(
+            transport=SocketTransport("127.0.0.1", stand_in.port))
+
+    monkeypatch.setattr("tektronixsg.server.SignalGenerator",
+                        open_generator)
+    instrument_server = InstrumentServer(str(tmp_path / "server.sock"))
+    threads = [threading.Thread(target=instrument_server.get_session)
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(opened) == 1
+    instrument_server.close()
+
+
+def test_client_process(server):
+    # The client owns the blocks of its requests and attaches to the ones
+    # of the responses, neither side may leave them to a resource tracker
+    client = "\n".join([
+        "import numpy as np",
+        "from tektronixsg.server import RemoteSignalGenerator",
+        "device = RemoteSignalGenerator({!r})".format(server.address),
+        "device.channels[0].set_arbitrary_signal(",
+        "    np.linspace(-1, 1, 50000))",
+        "assert len(device.read_data_emom(memory=1)) == 50000",
+        "device.close()"])
+    result = subprocess.run([sys.executable, "-c", client],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "resource_tracker" not in result.stderr
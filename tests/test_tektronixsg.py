@@ -1,8 +1,10 @@
 """Tests for `tektronixsg` package."""
 import pytest
 import numpy as np
+import threading
 import time
-from tektronixsg import SignalGenerator, generator, channel
+from tektronixsg import SignalGenerator, ChannelGroup, Sequence, \
+    Timeline, WaveformBuilder, generator, channel
 
 test_device = SignalGenerator()
 
@@ -255,3 +257,219 @@ def test_set_arbitrary_signal(default_device):
     device.channels[0].set_arbitrary_signal(voltage_vector=voltage_vector)
     assert device.channels[0].voltage_amplitude == voltage_range
     assert device.channels[0].voltage_offset == voltage_offset
+
+
+def test_save_recall_setup(default_device):
+    device = default_device
+    device.channels[0].frequency = 1000
+    slot = device.save_setup("first")
+    assert device.setup_slots["first"] == slot
+    device.channels[0].frequency = 2000
+    state = device.recall_setup("first")
+    assert state[("1", "frequency")] == 1000
+    assert device.channels[0].frequency == 1000
+
+
+def test_concurrent_access(default_device):
+    device = default_device
+    errors = []
+
+    def read_frequency():
+        try:
+            for _ in range(5):
+                assert device.channels[0].frequency == 1000
+        except AssertionError as error:
+            errors.append(error)
+
+    device.channels[0].frequency = 1000
+    threads = [threading.Thread(target=read_frequency) for _ in range(3)]
+    threads.append(threading.Thread(
+        target=lambda: setattr(device.channels[1], "frequency", 2000)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert device.channels[1].frequency == 2000
+
+
+def test_pipeline(default_device):
+    device = default_device
+    pipeline = device.start_pipeline()
+    futures = [pipeline.set("frequency", frequency, "1")
+               for frequency in [10, 100, 1000]]
+    frequency = pipeline.get("frequency", "1")
+    for future in futures:
+        assert future.result() is None
+    assert frequency.result() == 1000
+    with pytest.raises(ValueError):
+        pipeline.write("SOUR1:FREQ 1e12").result()
+    device.pipeline.close()
+    device.pipeline = None
+
+
+def test_trigger_train(default_device):
+    device = default_device
+    result = device.trigger_train(20, 50)
+    assert result["mode"] == "software"
+    assert len(result["timestamps"]) == 20
+    assert result["rate"] > 0
+    if device.connected_device == "AFG31052":
+        result = device.trigger_train(10, 1e4)
+        assert result["mode"] == "timer"
+
+
+def test_channel_group(default_device):
+    device = default_device
+    group = ChannelGroup(device)
+    group.set(frequency=1000, voltage_amplitude=1)
+    for device_channel in device.channels:
+        assert device_channel.frequency == 1000
+        assert device_channel.voltage_amplitude == 1
+    group.set(mirrored=True, phase=np.pi / 2, voltage_offset=0.5)
+    assert np.isclose(device.channels[1].phase, -np.pi / 2)
+    assert device.channels[1].voltage_offset == -0.5
+    group.set(mirrored=True, frequency=2000)
+    assert device.channels[0].phase == 0
+    assert np.isclose(device.channels[1].phase, np.pi)
+    with pytest.raises(ValueError):
+        group.set(mirrored=True, signal_type="ramp")
+    with pytest.raises(ValueError):
+        group.set(mirrored=True, voltage_max=1)
+    group.start()
+    assert all(device_channel.output_on for device_channel in device.channels)
+    group.stop()
+    assert not any(device_channel.output_on
+                   for device_channel in device.channels)
+
+
+def test_waveform_builder(default_device):
+    device = default_device
+    builder = WaveformBuilder(device)
+    waveform = builder.build("multitone", cycles=[1, 3], amplitudes=[1, 0.5])
+    assert len(waveform.data) == builder.length
+    assert builder.build("multitone", cycles=[1, 3],
+                         amplitudes=[1, 0.5]) is waveform
+    builder.upload(device.channels[0], "chirp", start_cycles=1,
+                   stop_cycles=20)
+    assert device.channels[0].signal_type == "memory1"
+
+
+def test_wait_for_completion(default_device):
+    device = default_device
+    device.channels[0].frequency = 1000
+    device.wait_for_completion(timeout=5)
+    with pytest.warns(UserWarning):
+        device.write("SOUR1:FREQ 1e12")
+
+
+@pytest.mark.parametrize("modulation, settings", [
+    ("am", {"depth": 50, "frequency": 100, "shape": "sine"}),
+    ("fm", {"deviation": 100, "frequency": 10}),
+    ("fsk", {"hop_frequency": 2000, "frequency": 10})])
+def test_modulation(default_device, modulation, settings):
+    device = default_device
+    device_channel = device.channels[0]
+    device_channel.frequency = 1000
+    device_channel.set_modulation(modulation, **settings)
+    assert device_channel.modulation == modulation
+    device_channel.modulation = None
+    assert device_channel.modulation is None
+
+
+def test_set_arbitrary_signal_optimized(default_device):
+    device = default_device
+    period = np.array([1, 2, 3, 4, 2, 1, 1.5, 1.6, 1.7])
+    device.channels[0].frequency = 100
+    report = device.channels[0].set_arbitrary_signal(
+        voltage_vector=np.tile(period, 10), optimize=True)
+    assert report["repetitions"] == 10
+    assert report["reduction"] == 10
+    assert device.channels[0].frequency == 1000
+    assert device.channels[0].voltage_amplitude == 3
+
+
+def test_set_arbitrary_file(default_device, tmp_path):
+    device = default_device
+    path = str(tmp_path / "waveform.npy")
+    np.save(path, np.array([1, 2, 3, 4, 2, 1, 1.5, 1.6, 1.7]))
+    device.channels[0].set_arbitrary_file(path, chunk_size=4)
+    assert device.channels[0].voltage_amplitude == 3
+    assert device.channels[0].voltage_offset == 2.5
+    assert device.read_data_emom(memory=1)[3] == 16383
+
+
+def test_get_many(default_device):
+    device = default_device
+    device_channel = device.channels[0]
+    device_channel.frequency = 1000
+    device_channel.voltage_amplitude = 2
+    device_channel.signal_type = "square"
+    values = device_channel.get("frequency", "voltage_amplitude",
+                                "signal_type", "output_on")
+    assert values == {"frequency": 1000, "voltage_amplitude": 2,
+                      "signal_type": "square", "output_on": False}
+    values = device.get_many(("1", "frequency"), ("2", "output_on"))
+    assert values == {("1", "frequency"): 1000, ("2", "output_on"): False}
+
+
+def test_swap_arbitrary_signal(default_device):
+    device = default_device
+    if device.connected_device == "AFG31052":
+        device_channel = device.channels[0]
+        device_channel.output_on = True
+        for voltage_range in [1, 2, 3]:
+            latency = device_channel.swap_arbitrary_signal(
+                np.linspace(0, voltage_range, 1000))
+            assert latency > 0
+            assert device_channel.voltage_amplitude == voltage_range
+        device_channel.signal_type = "sine"
+        device.write("SOUR2:FUNC SIN")
+        device.reset()
+        for device_channel in device.channels:
+            device_channel.swap_arbitrary_signal(np.linspace(0, 1, 1000))
+            assert device.query_str("SOUR{}:FUNC?".format(
+                device_channel.channel_number)) == "EFIL"
+
+
+def test_calibrate_transfers(default_device):
+    device = default_device
+    data = [0, 5000, 14000]
+    device.write_data_emom(data, memory=1)
+    settings = device.calibrate_transfers(save=False)
+    assert settings.throughput > 0
+    assert device.transfer_settings is settings
+    assert device.read_data_emom(memory=1) == data
+
+
+def test_sequence(default_device):
+    device = default_device
+    if device.connected_device == "AFG31052":
+        sequence = Sequence(device)
+        sequence.add_waveform("ramp", np.linspace(0, 1, 1000))
+        sequence.add_waveform("sine", np.sin(np.linspace(0, 2 * np.pi,
+                                                         1000)))
+        sequence.add_entry("ramp", repeat=10)
+        sequence.add_entry("sine", repeat=None, wait_trigger=True, goto=1)
+        sequence.upload()
+        sequence.run()
+        sequence.stop()
+        sequence.add_entry("missing")
+        with pytest.raises(ValueError):
+            sequence.validate()
+
+
+def test_timeline(default_device):
+    device = default_device
+    timeline = Timeline(device)
+    timeline.add(0.5, "voltage_amplitude", 2, "1")
+    timeline.add(0.2, "signal_type", "square", "1")
+    timeline.add(0.201, "frequency", 2000, "2")
+    result = timeline.run()
+    assert result["transfers"] == 2
+    assert all(late < 0.1 for late in result["lateness"])
+    assert device.channels[0].voltage_amplitude == 2
+    assert device.channels[0].signal_type == "square"
+    assert device.channels[1].frequency == 2000
+    with pytest.raises(ValueError):
+        timeline.add(1, "amplitude", 1, "1")
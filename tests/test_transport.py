@@ -0,0 +1,157 @@
+"""Tests for the transports of `tektronixsg` using a local stand-in."""
+import time
+
+import pytest
+
+from tektronixsg import SignalGenerator
+from tektronixsg.channel import Channel
+from tektronixsg.transport import SocketTransport, from_ieee_block, \
+    to_ieee_block
+
+
+def test_ieee_block():
+    values = [0, 10, 2570, 16383]
+    block = to_ieee_block(values)
+    assert block.startswith(b"#18")
+    assert from_ieee_block(block + b"\n") == values
+
+
+def test_socket_query(stand_in):
+    transport = SocketTransport("127.0.0.1", stand_in.port)
+    assert transport.query("*IDN?").startswith("TEKTRONIX,AFG31052")
+    transport.write("SOUR1:FREQ 1000")
+    assert transport.query("SOUR1:FREQ?") == "1000\n"
+    transport.close()
+
+
+def test_socket_binary_values(stand_in):
+    transport = SocketTransport("127.0.0.1", stand_in.port)
+    values = [0, 10, 2570, 16383, 10]
+    transport.write_binary_values("DATA:DATA EMEM1,", values)
+    assert transport.query_binary_values("DATA:DATA? EMEM1") == values
+    transport.close()
+
+
+def test_signal_generator(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    assert device.connected_device == "AFG31052"
+    device.channels[0].frequency = 1000
+    assert device.channels[0].frequency == 1000
+    device.close()
+
+
+def test_query_after_reset(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    start = time.monotonic()
+    device.reset()
+    device.query("*IDN?")
+    assert time.monotonic() - start >= 0.5
+    device.close()
+
+
+def test_wait_for_completion(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    assert b"*ESE 61;*SRE 36" in stand_in.messages
+    device.wait_for_completion(timeout=1)
+    stand_in.complete = False
+    with pytest.raises(TimeoutError):
+        device.wait_for_completion(timeout=0.1)
+    device.close()
+
+
+def test_query_after_timeout(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    stand_in.completion_delay = 0.3
+    with pytest.raises(TimeoutError):
+        device.wait_for_completion(timeout=0.1)
+    stand_in.completion_delay = 0
+    device.channels[0].frequency = 1000
+    assert device.query("*IDN?").startswith("TEKTRONIX,AFG31052")
+    assert device.channels[0].frequency == 1000
+    device.close()
+
+
+def test_socket_write_stream(stand_in):
+    transport = SocketTransport("127.0.0.1", stand_in.port)
+    values = [0, 10, 2570, 16383]
+    block = to_ieee_block(values)
+    transport.write_stream([b"DATA:DATA EMEM1,", block[:5], block[5:],
+                            b"\n"])
+    assert transport.query_binary_values("DATA:DATA? EMEM1") == values
+    transport.close()
+
+
+def test_pipeline_errors(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    pipeline = device.start_pipeline()
+    long_write = pipeline.write("SOUR1:FREQ " + "1" * 1020)
+    bad_write = pipeline.write("BAD 1")
+    bad_call = pipeline.call(device.write, "BAD 2")
+    assert long_write.result() is None
+    with pytest.raises(ValueError, match="Undefined header"):
+        bad_write.result()
+    with pytest.raises(ValueError, match="Undefined header"):
+        bad_call.result()
+    assert pipeline.get("frequency", "1").result() == float("1" * 1020)
+    device.close()
+
+
+def test_pipeline_closed(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    pipeline = device.start_pipeline()
+    future = pipeline.write("SOUR1:FREQ 1000")
+    pipeline.close(wait=False)
+    with pytest.raises(RuntimeError):
+        pipeline.write("SOUR1:FREQ 2000")
+    assert future.result(timeout=5) is None
+    pipeline.close()
+    device.pipeline = None
+    device.close()
+
+
+def test_get_many(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    stand_in.settings["TRIG:SOUR"] = "EXT"
+    stand_in.settings["SOUR1:FREQ"] = "1000"
+    stand_in.settings["SOUR2:FUNC"] = "SQU"
+    start = len(stand_in.messages)
+    values = device.get_many("trigger_source", ("1", "frequency"),
+                             ("2", "signal_type"), ("1", "modulation"))
+    assert values == {"trigger_source": "external", ("1", "frequency"): 1000,
+                      ("2", "signal_type"): "square",
+                      ("1", "modulation"): None}
+    queries = [message for message in stand_in.messages[start:]
+               if message not in (b"*STB?", b"*OPC?")]
+    assert len(queries) == 1
+    device.close()
+
+
+def test_get_many_dependent_queries(stand_in, monkeypatch):
+    def modulation(channel):
+        # Stops at the first enabled modulation
+        for name in ("am", "fm", "pm"):
+            if channel.generator.query_bool("SOUR{}:{}:STAT?".format(
+                    channel.channel_number, name.upper())):
+                return name
+        return None
+
+    monkeypatch.setattr(Channel, "modulation", property(modulation))
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    stand_in.settings["SOUR1:AM:STAT"] = "0"
+    stand_in.settings["SOUR1:FM:STAT"] = "1"
+    start = len(stand_in.messages)
+    values = device.get_many(("1", "modulation"), ("2", "modulation"))
+    assert values == {("1", "modulation"): "fm", ("2", "modulation"): None}
+    # One message per answer a query depends on, not one per query
+    queries = [message for message in stand_in.messages[start:]
+               if message not in (b"*STB?", b"*OPC?")]
+    assert len(queries) == 3
+    device.close()
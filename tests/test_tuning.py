@@ -0,0 +1,28 @@
+"""Tests for the transfer tuning of `tektronixsg` using a local stand-in."""
+import json
+
+from tektronixsg import SignalGenerator, SocketTransport
+from tektronixsg.tuning import load_transfer_settings
+
+
+def test_calibrate(stand_in):
+    device = SignalGenerator(
+        transport=SocketTransport("127.0.0.1", stand_in.port))
+    data = [0, 5000, 14000]
+    device.write_data_emom(data, memory=1)
+    start = len(stand_in.messages)
+    settings = device.calibrate_transfers(save=False)
+    assert settings.throughput > 0
+    # The errors are only checked once after the benchmark
+    assert stand_in.messages[start:].count(b"*STB?") == 1
+    assert device.read_data_emom(memory=1) == data
+    device.close()
+
+
+def test_malformed_settings(tmp_path):
+    path = str(tmp_path / "transfer.json")
+    with open(path, "w") as settings_file:
+        json.dump({"C000001": {"chunk": 1}, "C000002": 5}, settings_file)
+    assert load_transfer_settings("C000001", path) is None
+    assert load_transfer_settings("C000002", path) is None
+    assert load_transfer_settings("C000003", path) is None
@@ -0,0 +1,63 @@
+"""Tests for the waveform helpers of `tektronixsg`."""
+import wave
+
+import numpy as np
+
+from tektronixsg.waveforms import encode_stream, encode_waveform, \
+    open_waveform_file, reduce_waveform
+
+
+def test_open_24_bit_wav(tmp_path):
+    path = str(tmp_path / "signal.wav")
+    samples = np.array([-2 ** 23, -1, 0, 1, 2 ** 23 - 1])
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(3)
+        wav_file.setframerate(8000)
+        wav_file.writeframes(b"".join(
+            int(sample).to_bytes(3, "little", signed=True)
+            for sample in np.stack([samples, samples // 2], 1).ravel()))
+    loaded, scale, zero = open_waveform_file(path, channel=1)
+    assert len(loaded) == len(samples)
+    assert list(loaded[:]) == list(samples // 2)
+    assert scale == 2. ** -23
+    amplitude, offset, chunks = encode_stream(loaded, scale, zero,
+                                              chunk_size=2)
+    expected = encode_waveform((samples // 2) * scale)
+    assert np.isclose(amplitude, expected.voltage_amplitude)
+    assert np.isclose(offset, expected.voltage_offset)
+    assert b"".join(chunks) == expected.data.astype(">i2").tobytes()
+
+
+def test_reduce_periodic():
+    period = np.sin(np.linspace(0, 2 * np.pi, 100, endpoint=False))
+    reduced, repetitions, decimation, error = reduce_waveform(
+        np.tile(period, 8))
+    assert (len(reduced), repetitions, decimation) == (100, 8, 1)
+    assert error < 1e-12
+
+
+def test_reduce_held_values():
+    values = np.repeat([0., 1., 0.5, -1.], 25)
+    reduced, repetitions, decimation, error = reduce_waveform(
+        np.tile(values, 3))
+    assert list(reduced) == [0., 1., 0.5, -1.]
+    assert (repetitions, decimation, error) == (3, 25, 0.)
+
+
+def test_reduce_error_budget():
+    tolerance = 1e-2
+    # Both the periods and the blocks of the mean period deviate by almost
+    # the limit, only one of the steps fits into the tolerance
+    period = np.repeat([0., 10., 3., 7.], 2) + np.tile([0., 0.09], 4)
+    signal = np.concatenate((period - 0.09, period + 0.09))
+    reduced, repetitions, decimation, error = reduce_waveform(signal,
+                                                              tolerance)
+    assert (repetitions, decimation) == (2, 1)
+    assert error <= tolerance * np.ptp(signal)
+
+
+def test_reduce_aperiodic():
+    signal = np.concatenate((np.zeros(100), np.linspace(0, 1, 100)))
+    reduced, repetitions, decimation, error = reduce_waveform(signal)
+    assert (len(reduced), repetitions, decimation, error) == (200, 1, 1, 0.)